@@ -0,0 +1,281 @@
+import asyncio
+import io
+import json
+import os
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+
+from fastapi import UploadFile
+
+import config
+from cache import render_key_parts, result_cache
+from executor import executor
+from processor import process_pdf_report
+from uploads import SpooledUpload, UploadTooLargeError, _spool, spool_upload
+
+ZIP_MAGIC = b"PK\x03\x04"
+
+
+@dataclass
+class BatchItem:
+    """
+    Один PDF из пакета; error — причина, по которой файл не проверялся.
+    Содержимое лежит во временном файле upload, его удаляет close().
+    """
+    name: str
+    upload: Optional[SpooledUpload] = None
+    error: Optional[str] = None
+
+    def close(self):
+        if self.upload is not None:
+            self.upload.close()
+
+
+class TooManyFilesError(Exception):
+    """В пакете больше файлов, чем BATCH_MAX_FILES"""
+
+
+async def collect_items(files: List[UploadFile]) -> List[BatchItem]:
+    """
+    Раскладывает загруженные файлы в список PDF: ZIP-архивы распаковываются,
+    остальные файлы проверяются как PDF. Ошибки отдельных файлов не прерывают
+    пакет, а записываются в BatchItem.error.
+
+    Файлы и распакованные из архивов PDF пишутся во временные файлы по кускам.
+    Их суммарный размер ограничен MAX_BATCH_BYTES (иначе UploadTooLargeError),
+    размер одного PDF — MAX_UPLOAD_BYTES.
+    """
+    items: List[BatchItem] = []
+    budget = _Budget(config.MAX_BATCH_BYTES)
+    try:
+        for file in files:
+            name = file.filename or "file.pdf"
+            try:
+                upload = await spool_upload(file, budget.remaining)
+            except UploadTooLargeError:
+                raise budget.error()
+            if upload.head.startswith(ZIP_MAGIC) or name.lower().endswith(".zip"):
+                # в лимит пакета входят распакованные PDF, а не сам архив
+                try:
+                    items.extend(await asyncio.to_thread(_expand_zip, name, upload.path, budget))
+                finally:
+                    upload.close()
+            elif upload.size > config.MAX_UPLOAD_BYTES:
+                upload.close()
+                items.append(BatchItem(name=_base_name(name), error=_too_large()))
+            else:
+                budget.spend(upload.size)
+                items.append(_pdf_item(name, upload))
+            if len(items) > config.BATCH_MAX_FILES:
+                raise TooManyFilesError(f"В пакете больше {config.BATCH_MAX_FILES} файлов")
+    except BaseException:
+        close_items(items)
+        raise
+
+    _dedupe_names(items)
+    return items
+
+
+def close_items(items: List[BatchItem]):
+    for item in items:
+        item.close()
+
+
+class _Budget:
+    """Остаток MAX_BATCH_BYTES на файлы пакета"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.remaining = limit
+
+    def spend(self, size: int):
+        if size > self.remaining:
+            raise self.error()
+        self.remaining -= size
+
+    def error(self) -> UploadTooLargeError:
+        return UploadTooLargeError(f"Пакет больше {self.limit // (1024 * 1024)} МБ")
+
+
+def _too_large() -> str:
+    return f"Файл больше {config.MAX_UPLOAD_BYTES // (1024 * 1024)} МБ"
+
+
+def _base_name(name: str) -> str:
+    return os.path.basename(name.replace("\\", "/")) or "file.pdf"
+
+
+def _check_name(name: str) -> Optional[str]:
+    if not name.lower().endswith(".pdf"):
+        return "Файл должен иметь расширение .pdf"
+    return None
+
+
+def _pdf_item(name: str, upload: SpooledUpload) -> BatchItem:
+    name = _base_name(name)
+    error = _check_name(name)
+    if error is None and not upload.head.startswith(b"%PDF"):
+        error = "Файл не является корректным PDF-документом"
+    if error is not None:
+        upload.close()
+        return BatchItem(name=name, error=error)
+    return BatchItem(name=name, upload=upload)
+
+
+def _expand_zip(name: str, path: str, budget: "_Budget") -> List[BatchItem]:
+    """
+    Распаковывает PDF из архива во временные файлы. Размер из заголовка
+    архива проверяется заранее, но не считается достоверным: записи читаются
+    кусками и обрываются, как только превышен лимит.
+    """
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        return [BatchItem(name=name, error="Архив повреждён или не является ZIP")]
+
+    items = []
+    try:
+        with archive:
+            for info in archive.infolist():
+                entry_name = os.path.basename(info.filename)
+                if info.is_dir() or entry_name.startswith("."):
+                    continue
+                if len(items) >= config.BATCH_MAX_FILES:
+                    raise TooManyFilesError(f"В пакете больше {config.BATCH_MAX_FILES} файлов")
+                items.append(_zip_item(archive, info, budget))
+    except BaseException:
+        close_items(items)
+        raise
+    return items
+
+
+def _zip_item(archive: zipfile.ZipFile, info: zipfile.ZipInfo, budget: "_Budget") -> BatchItem:
+    name = os.path.basename(info.filename)
+    error = _check_name(name)
+    if error is not None:
+        return BatchItem(name=name, error=error)
+
+    if info.file_size > config.MAX_UPLOAD_BYTES:
+        return BatchItem(name=name, error=_too_large())
+    if info.file_size > budget.remaining:
+        raise budget.error()
+
+    limit = min(config.MAX_UPLOAD_BYTES, budget.remaining)
+    try:
+        with archive.open(info) as entry:
+            upload = _spool(entry, name, limit)
+    except UploadTooLargeError:
+        if limit < config.MAX_UPLOAD_BYTES:
+            raise budget.error()
+        return BatchItem(name=name, error=_too_large())
+    except (zipfile.BadZipFile, NotImplementedError, RuntimeError, EOFError, zlib.error) as e:
+        return BatchItem(name=name, error=f"Не удалось распаковать файл: {e}")
+
+    budget.spend(upload.size)
+    return _pdf_item(name, upload)
+
+
+def _dedupe_names(items: List[BatchItem]):
+    used = set()
+    for item in items:
+        stem, ext = os.path.splitext(item.name)
+        name, n = item.name, 1
+        while name in used:
+            n += 1
+            name = f"{stem}_{n}{ext}"
+        used.add(name)
+        item.name = name
+
+
+class _ChunkSink(io.RawIOBase):
+    """Неперематываемый поток: zipfile пишет в него, ответ забирает готовые куски"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def _check_item(item: BatchItem) -> dict:
+    """Проверяет один PDF (с кэшем, как /upload); результат — запись сводки"""
+    upload = item.upload
+    keys = upload.key("render", *render_key_parts()), upload.key("report")
+    processed, report = await asyncio.to_thread(lambda: [result_cache.get(key) for key in keys])
+    if processed is None or report is None:
+        processed, report = await executor.run(process_pdf_report, upload.path, wait=True)
+        await asyncio.to_thread(lambda: [result_cache.put(k, v) for k, v in zip(keys, (processed, report))])
+
+    parsed = json.loads(report)
+    return {
+        "name": item.name,
+        "status": "ok",
+        "page_count": parsed["page_count"],
+        "error_count": len(parsed["errors"]),
+        "errors": parsed["errors"],
+        "_processed": processed,
+    }
+
+
+async def run_batch(items: List[BatchItem]) -> AsyncIterator[bytes]:
+    """
+    Проверяет файлы пакета в пуле обработчиков и отдаёт ZIP по мере готовности:
+    processed/<имя>.pdf — для каждого проверенного файла, в порядке завершения,
+    summary.json — сводка по всем файлам в исходном порядке, в конце архива.
+    Одновременно в работе не больше файлов, чем обработчиков, чтобы пакет
+    не занимал всю очередь и не мешал одиночным запросам.
+    Временные файлы пакета удаляются по его завершении.
+    """
+    sink = _ChunkSink()
+    archive = zipfile.ZipFile(sink, "w")
+    in_flight = asyncio.Semaphore(executor.workers)
+    results: List[Optional[dict]] = [None] * len(items)
+
+    async def check(index: int, item: BatchItem):
+        async with in_flight:
+            try:
+                return index, await _check_item(item)
+            except Exception as e:
+                return index, {"name": item.name, "status": "error", "detail": f"Ошибка обработки PDF: {e}"}
+
+    tasks = []
+    for index, item in enumerate(items):
+        if item.error is not None:
+            results[index] = {"name": item.name, "status": "error", "detail": item.error}
+        else:
+            tasks.append(asyncio.create_task(check(index, item)))
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            processed = result.pop("_processed", None)
+            results[index] = result
+            if processed is not None:
+                await asyncio.to_thread(archive.writestr, f"processed/{result['name']}", processed)
+                yield sink.take()
+    finally:
+        for task in tasks:
+            task.cancel()
+        close_items(items)
+
+    summary = {
+        "file_count": len(results),
+        "ok": sum(1 for r in results if r["status"] == "ok"),
+        "failed": sum(1 for r in results if r["status"] == "error"),
+        "files": results,
+    }
+    archive.writestr("summary.json", json.dumps(summary, ensure_ascii=False, indent=2),
+                     compress_type=zipfile.ZIP_DEFLATED)
+    archive.close()
+    yield sink.take()
@@ -0,0 +1,68 @@
+"""
+Входные документы для бенчмарков: примеры из tests/examples и сгенерированные
+документы заданного размера. Генерация детерминирована — одинаковые параметры
+дают одинаковые байты, поэтому результаты разных запусков сравнимы.
+"""
+import pathlib
+import random
+from typing import Iterator, List, Tuple
+
+import fitz
+
+EXAMPLES_DIR = pathlib.Path(__file__).resolve().parent.parent / "tests" / "examples"
+
+# Виды сгенерированных документов
+KINDS = ("text", "images")
+
+PARAGRAPH = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
+    "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. "
+)
+
+
+def examples() -> Iterator[Tuple[str, bytes]]:
+    for path in sorted(EXAMPLES_DIR.rglob("*.pdf")):
+        yield path.relative_to(EXAMPLES_DIR).as_posix(), path.read_bytes()
+
+
+def generate(kind: str, pages: int, seed: int = 0) -> bytes:
+    """
+    Документ на pages страниц: абзацы с отступом первой строки и номер страницы;
+    для kind="images" — ещё и несжимаемое изображение на каждой второй странице
+    (как фотографии и сканы во вложениях реальных работ)
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Неизвестный вид документа: {kind}")
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page(width=595, height=842)
+        y = 57
+        for _ in range(rng.randint(3, 5)):
+            text = PARAGRAPH * rng.randint(2, 4)
+            rect = fitz.Rect(85, y, 538, y + 200)
+            rest = page.insert_textbox(rect, "      " + text, fontname="tiro", fontsize=14,
+                                       lineheight=1.5, align=fitz.TEXT_ALIGN_JUSTIFY)
+            y = rect.y1 - rest + 10 if rest >= 0 else rect.y1
+            if y > 560:
+                break
+
+        if kind == "images" and number % 2 == 0:
+            pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 600, 400), False)
+            pixmap.samples_mv[:] = rng.randbytes(len(pixmap.samples_mv))
+            page.insert_image(fitz.Rect(147, 590, 447, 790), pixmap=pixmap)
+
+        page.insert_text((292, 815), str(number + 1), fontname="tiro", fontsize=12)
+
+    doc.set_metadata({})
+    data = doc.tobytes(deflate=True, no_new_id=True)
+    doc.close()
+    return data
+
+
+def generated(sizes: List[int], kinds=KINDS) -> Iterator[Tuple[str, bytes]]:
+    for kind in kinds:
+        for pages in sizes:
+            yield f"generated/{kind}-{pages}p", generate(kind, pages)
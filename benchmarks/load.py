@@ -0,0 +1,290 @@
+"""
+Нагрузочный тест HTTP API: запускает сервер из main.py (uvicorn) и отправляет
+в /upload смесь документов из tests/examples и сгенерированных на нескольких
+уровнях параллельности.
+
+    python -m benchmarks.load --concurrency 1 4 8 --requests 100
+    python -m benchmarks.load --workers 4 --pages 50 200 --output load.json
+
+Для каждого уровня — пропускная способность, задержки p50/p95/p99, доля ошибок
+(отдельно — 503 из-за заполненной очереди) и пиковая RSS сервера вместе
+с процессами-обработчиками. Кэш результатов на время теста выключается
+(одинаковые документы иначе отдавались бы из кэша); --cache оставляет его.
+С --url тест идёт против уже запущенного сервера, RSS тогда не измеряется.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.corpus import KINDS, examples, generated
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def multipart_body(name: str, data: bytes) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    filename = os.path.basename(name) if name.endswith(".pdf") else os.path.basename(name) + ".pdf"
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode()
+    return head + data + f"\r\n--{boundary}--\r\n".encode(), f"multipart/form-data; boundary={boundary}"
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _process_tree(pid: int) -> List[int]:
+    """pid и все его потомки (по /proc)"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, ()))
+    return tree
+
+
+def tree_rss(pid: int) -> int:
+    """Суммарная RSS процесса и его потомков, байт (только Linux)"""
+    total = 0
+    for member in _process_tree(pid):
+        try:
+            with open(f"/proc/{member}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+    return total
+
+
+class RSSSampler:
+    """Фоновый замер пиковой RSS дерева процессов сервера"""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "RSSSampler":
+        if self.pid is not None and os.path.isdir("/proc"):
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, tree_rss(self.pid))
+            self._stop.wait(self.interval)
+
+
+class Server:
+    """uvicorn main:app в отдельном процессе на свободном порту"""
+
+    def __init__(self, env: Dict[str, str], startup_timeout: float = 60):
+        self.port = _free_port()
+        self.env = {**os.environ, **env}
+        self.startup_timeout = startup_timeout
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "Server":
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.port), "--log-level", "warning"],
+            cwd=ROOT, env=self.env,
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Сервер завершился при запуске (код {self.process.returncode})")
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=1)
+                connection.request("GET", "/metrics")
+                connection.getresponse().read()
+                connection.close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError("Сервер не запустился за отведённое время")
+
+    def __exit__(self, *exc):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+def send(url: str, path: str, body: bytes, content_type: str, timeout: float) -> Tuple[int, float]:
+    """Один запрос; (код ответа или 0 при сетевой ошибке, время до конца ответа)"""
+    parsed = urllib.parse.urlsplit(url)
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+    try:
+        connection.request("POST", path, body=body, headers={"Content-Type": content_type})
+        response = connection.getresponse()
+        response.read()
+        status = response.status
+    except OSError:
+        status = 0
+    finally:
+        connection.close()
+    return status, time.perf_counter() - start
+
+
+def run_level(url: str, path: str, bodies: List[Tuple[bytes, str]], concurrency: int,
+              requests: int, timeout: float, server_pid: Optional[int]) -> dict:
+    order = list(itertools.islice(itertools.cycle(bodies), requests))
+    with RSSSampler(server_pid) as rss, ThreadPoolExecutor(concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda item: send(url, path, *item, timeout), order))
+        elapsed = time.perf_counter() - start
+
+    latencies = [seconds for status, seconds in results if status == 200]
+    statuses: Dict[str, int] = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = len(results) - len(latencies)
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "error_rate": round(errors / len(results), 4) if results else 0,
+        "rejected": statuses.get("503", 0),
+        "statuses": statuses,
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1) if server_pid is not None else None,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест /upload")
+    parser.add_argument("--url", help="адрес уже запущенного сервера (по умолчанию сервер запускается)")
+    parser.add_argument("--path", default="/upload", help="проверяемый метод API")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8],
+                        help="уровни параллельности")
+    parser.add_argument("--requests", type=int, default=50, help="запросов на уровень")
+    parser.add_argument("--pages", type=int, nargs="*", default=[20],
+                        help="размеры сгенерированных документов, страниц")
+    parser.add_argument("--kinds", nargs="*", default=list(KINDS), choices=KINDS,
+                        help="виды сгенерированных документов")
+    parser.add_argument("--no-examples", action="store_true", help="без документов из tests/examples")
+    parser.add_argument("--workers", type=int, help="CHECKY_WORKERS запускаемого сервера")
+    parser.add_argument("--queue-size", type=int, help="CHECKY_QUEUE_SIZE запускаемого сервера")
+    parser.add_argument("--cache", action="store_true", help="не выключать кэш результатов")
+    parser.add_argument("--timeout", type=float, default=300, help="таймаут запроса, секунд")
+    parser.add_argument("--seed", type=int, default=0, help="порядок документов в смеси")
+    parser.add_argument("--output", help="файл для результатов в JSON")
+    args = parser.parse_args(argv)
+
+    documents = [] if args.no_examples else list(examples())
+    documents += list(generated(args.pages, args.kinds))
+    random.Random(args.seed).shuffle(documents)
+    bodies = [multipart_body(name, data) for name, data in documents]
+
+    # очередь /jobs серверу теста не нужна — её база создаётся во временном каталоге
+    spool = tempfile.TemporaryDirectory(prefix="checky-load-")
+    env = {"CHECKY_JOB_WORKERS": "0", "CHECKY_JOBS_DB": os.path.join(spool.name, "jobs.sqlite3")}
+    if not args.cache:
+        env.update({"CHECKY_CACHE_MEMORY_BYTES": "0", "CHECKY_CACHE_DIR": ""})
+    if args.workers is not None:
+        env["CHECKY_WORKERS"] = str(args.workers)
+    if args.queue_size is not None:
+        env["CHECKY_QUEUE_SIZE"] = str(args.queue_size)
+
+    levels = []
+    if args.url:
+        spool.cleanup()
+        for concurrency in args.concurrency:
+            levels.append(run_level(args.url, args.path, bodies, concurrency, args.requests, args.timeout, None))
+            print(_format(levels[-1]), file=sys.stderr)
+    else:
+        with spool, Server(env) as server:
+            for concurrency in args.concurrency:
+                levels.append(run_level(server.url, args.path, bodies, concurrency, args.requests,
+                                        args.timeout, server.process.pid))
+                print(_format(levels[-1]), file=sys.stderr)
+
+    report = {
+        "path": args.path,
+        "documents": [name for name, _ in documents],
+        "server_env": {k: v for k, v in env.items() if k != "CHECKY_JOBS_DB"} if not args.url else None,
+        "levels": levels,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    return 0
+
+
+def _format(level: dict) -> str:
+    return (
+        f"c={level['concurrency']}: {level['throughput_rps']} запр/с, "
+        f"p50 {level['p50_ms']} мс, p95 {level['p95_ms']} мс, p99 {level['p99_ms']} мс, "
+        f"ошибок {level['error_rate']:.1%} (503: {level['rejected']}), RSS {level['peak_rss_mb']} МБ"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
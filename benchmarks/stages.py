@@ -0,0 +1,217 @@
+"""
+Бенчмарк этапов обработки: для каждого входного документа — время и пиковая
+память открытия, разбора, каждого правила, всех правил за один обход и
+отрисовки ошибок.
+
+    python -m benchmarks.stages --output results.json
+    python -m benchmarks.stages --baseline baseline.json --threshold 1.25
+
+Время — лучшее из --repeat запусков (без tracemalloc, он замедляет Python-код),
+память — пик выделений Python за отдельный запуск под tracemalloc. Память,
+выделенная внутри MuPDF, в пик не входит.
+
+С --baseline результаты сравниваются с сохранённым запуском: этап, ставший
+медленнее в threshold раз (или выделяющий в memory-threshold раз больше),
+считается регрессией, и код возврата — 1. Этапы быстрее --min-seconds
+по времени не сравниваются: на них сравнение упирается в шум.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+import fitz
+
+import config
+from benchmarks.corpus import KINDS, examples, generated
+from dom import Document
+from parser_dom import PDFDOMParser, open_pdf
+from processor import make_rules
+from renderer import render_errors
+from rules.engine import RuleEngine
+
+
+def measure(fn: Callable, setup: Callable[[], object] = None, repeat: int = 3,
+            teardown: Callable[[object], None] = None) -> Tuple[object, dict]:
+    """
+    Замер fn() или, если задан setup, fn(setup()) — подготовка в замер не входит.
+    teardown(результат setup()) вызывается после каждого запуска, тоже вне замера.
+    Возвращает результат последнего запуска и {"seconds", "peak_kb"}.
+    """
+    def prepare():
+        return (setup(),) if setup is not None else ()
+
+    def release(args):
+        if teardown is not None and args:
+            teardown(*args)
+
+    best = float("inf")
+    for _ in range(repeat):
+        args = prepare()
+        try:
+            start = time.perf_counter()
+            fn(*args)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            release(args)
+
+    args = prepare()
+    tracemalloc.start()
+    try:
+        result = fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        release(args)
+
+    return result, {"seconds": round(best, 6), "peak_kb": round(peak / 1024, 1)}
+
+
+def _clear_errors(document: Document) -> Document:
+    """Ошибки прошлого запуска правил убираются из дерева, чтобы не копились"""
+    stack = [document]
+    while stack:
+        node = stack.pop()
+        node.errors = []
+        stack.extend(node.children)
+    return document
+
+
+def bench_document(data: bytes, repeat: int = 3) -> dict:
+    parser = PDFDOMParser()
+    rules = make_rules()
+    stages: Dict[str, dict] = {}
+
+    # открытые при замере документы закрываются после него, закрытие в замер не входит
+    opened = []
+    doc, stages["open"] = measure(lambda: opened.append(open_pdf(data)) or opened[-1], repeat=repeat)
+    page_count = doc.page_count
+    for pdf in opened:
+        pdf.close()
+
+    # разбор — уже открытого документа, как в PDFSession; документ закрывается
+    # после каждого запуска, и страницы дерева отвязываются от него (как в PDFSession.close)
+    document, stages["parse"] = measure(
+        lambda pdf: parser.parse_document(pdf, data), setup=lambda: open_pdf(data),
+        teardown=lambda pdf: pdf.close(), repeat=repeat,
+    )
+    for page in document.pages:
+        page.orig = None
+
+    # каждый запуск правил — на дереве без ошибок прошлых запусков
+    for rule in rules:
+        _, stages[f"rule:{type(rule).__name__}"] = measure(
+            rule.check, setup=lambda: _clear_errors(document), repeat=repeat
+        )
+    errors, stages["rules"] = measure(
+        RuleEngine(rules).run, setup=lambda: _clear_errors(document), repeat=repeat
+    )
+
+    # отрисовка меняет документ, поэтому каждый запуск — на свежеоткрытом
+    _, stages["render"] = measure(
+        lambda pdf: render_errors(pdf, errors), setup=lambda: open_pdf(data),
+        teardown=lambda pdf: pdf.close(), repeat=repeat,
+    )
+
+    return {
+        "pages": page_count,
+        "bytes": len(data),
+        "errors": len(errors),
+        "stages": stages,
+    }
+
+
+def run(inputs, repeat: int = 3, log=print) -> dict:
+    results = {}
+    for name, data in inputs:
+        results[name] = bench_document(data, repeat=repeat)
+        total = sum(s["seconds"] for key, s in results[name]["stages"].items() if not key.startswith("rule:"))
+        log(f"{name}: {results[name]['pages']} стр., {total:.3f} с")
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "pymupdf": fitz.VersionBind,
+            "platform": platform.platform(),
+            "ruleset_version": config.RULESET_VERSION,
+            "render_mode": config.RENDER_MODE,
+            "columnar": config.COLUMNAR,
+            "repeat": repeat,
+        },
+        "inputs": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = 1.25,
+            memory_threshold: float = 1.5, min_seconds: float = 0.005) -> List[str]:
+    """Регрессии относительно baseline: по строке на этап (пусто — регрессий нет)"""
+    regressions = []
+    for name, result in current["inputs"].items():
+        base = baseline["inputs"].get(name)
+        if base is None:
+            continue
+        for stage, now in result["stages"].items():
+            was = base["stages"].get(stage)
+            if was is None:
+                continue
+            if was["seconds"] >= min_seconds and now["seconds"] > was["seconds"] * threshold:
+                regressions.append(
+                    f"{name} {stage}: время {was['seconds']:.4f} → {now['seconds']:.4f} с"
+                    f" (x{now['seconds'] / was['seconds']:.2f})"
+                )
+            if was["peak_kb"] > 0 and now["peak_kb"] > was["peak_kb"] * memory_threshold:
+                regressions.append(
+                    f"{name} {stage}: память {was['peak_kb']:.0f} → {now['peak_kb']:.0f} КБ"
+                    f" (x{now['peak_kb'] / was['peak_kb']:.2f})"
+                )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк этапов проверки PDF")
+    parser.add_argument("--output", help="файл для результатов в JSON")
+    parser.add_argument("--baseline", help="сохранённые результаты для сравнения")
+    parser.add_argument("--threshold", type=float, default=1.25, help="допустимое замедление, раз")
+    parser.add_argument("--memory-threshold", type=float, default=1.5, help="допустимый рост памяти, раз")
+    parser.add_argument("--min-seconds", type=float, default=0.005,
+                        help="этапы быстрее этого по времени не сравниваются")
+    parser.add_argument("--repeat", type=int, default=3, help="запусков каждого этапа")
+    parser.add_argument("--pages", type=int, nargs="*", default=[50, 200],
+                        help="размеры сгенерированных документов, страниц")
+    parser.add_argument("--kinds", nargs="*", default=list(KINDS), choices=KINDS,
+                        help="виды сгенерированных документов")
+    parser.add_argument("--no-examples", action="store_true", help="без документов из tests/examples")
+    args = parser.parse_args(argv)
+
+    inputs = []
+    if not args.no_examples:
+        inputs.append(examples())
+    inputs.append(generated(args.pages, args.kinds))
+    current = run((item for group in inputs for item in group), repeat=args.repeat,
+                  log=lambda line: print(line, file=sys.stderr))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(current, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold, args.memory_threshold, args.min_seconds)
+        for line in regressions:
+            print(f"РЕГРЕССИЯ {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("Регрессий нет", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import config
+import metrics
+
+
+def cache_key(input_bytes: bytes, *parts: str) -> str:
+    """
+    Ключ результата: хэш входного PDF + версия набора правил + параметры обработки.
+    Одинаковый ключ гарантирует одинаковый результат, поэтому он же служит ETag.
+    """
+    return digest_key(hashlib.sha256(input_bytes), *parts)
+
+
+def digest_key(digest, *parts: str) -> str:
+    """cache_key по уже посчитанному sha256 входа (например, при приёме загрузки)"""
+    digest = digest.copy()
+    for part in (config.RULESET_VERSION, *parts):
+        digest.update(b"\0" + str(part).encode())
+    return digest.hexdigest()
+
+
+def render_key_parts() -> tuple:
+    """Части ключа обработанного PDF: он зависит от режима сохранения"""
+    return (f"render_mode={config.RENDER_MODE}",)
+
+
+class MemoryTier:
+    """LRU в памяти с ограничением по суммарному размеру значений"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class DiskTier:
+    """
+    Файлы в каталоге, по одному на ключ. Порядок вытеснения — по времени
+    последнего обращения (mtime обновляется при чтении).
+
+    Суммарный размер считается при запуске и дальше ведётся в памяти;
+    каталог просматривается только при вытеснении. Вытесняется с запасом —
+    до EVICT_TO от лимита, чтобы следующие записи не просматривали его снова.
+    """
+
+    EVICT_TO = 0.9
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return value
+
+    def put(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(value)
+        with self._lock:
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            self.size += len(value) - replaced
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """(mtime, размер, путь) файлов кэша"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".tmp-") or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        # размер пересчитывается по каталогу: его могут менять и другие процессы
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.EVICT_TO
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.size = total
+
+
+class ResultCache:
+    """Двухуровневый кэш результатов: LRU в памяти и необязательный дисковый уровень"""
+
+    def __init__(self,
+                 memory_bytes: int = config.CACHE_MEMORY_BYTES,
+                 directory: str = config.CACHE_DIR,
+                 disk_bytes: int = config.CACHE_DISK_BYTES):
+        self.memory = MemoryTier(memory_bytes) if memory_bytes > 0 else None
+        self.disk = DiskTier(directory, disk_bytes) if directory else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        if self.memory is not None:
+            value = self.memory.get(key)
+            if value is not None:
+                metrics.CACHE_HITS.inc(tier="memory")
+                return value
+
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                metrics.CACHE_HITS.inc(tier="disk")
+                if self.memory is not None:
+                    self.memory.put(key, value)
+                return value
+
+        metrics.CACHE_MISSES.inc()
+        return None
+
+    def put(self, key: str, value: bytes):
+        if self.memory is not None:
+            self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+
+result_cache = ResultCache()
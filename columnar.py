@@ -0,0 +1,120 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import numpy as np
+
+from dom import Node, Page, Paragraph, Span
+
+
+@dataclass
+class ColumnStore:
+    """
+    Колоночное представление текста документа (или одной страницы) для
+    векторизованных правил. Строки и спаны лежат подряд в порядке обхода:
+    страницы → абзацы → строки → спаны; смещения задают границы групп.
+
+    line_bbox[i]               — bbox строки i (NaN, если у строки нет bbox)
+    paragraph_line_offsets[p]  — строки абзаца p: [off[p], off[p + 1])
+    page_paragraph_offsets[k]  — абзацы k-й страницы хранилища
+    span_*                     — bbox, размер, id шрифта (в fonts), цвет (-1 — нет) и строка спана
+    """
+    paragraphs: List[Paragraph]
+    pages: List[Page]
+    line_bbox: np.ndarray
+    paragraph_line_offsets: np.ndarray
+    page_paragraph_offsets: np.ndarray
+    span_bbox: np.ndarray
+    span_size: np.ndarray
+    span_font: np.ndarray
+    span_color: np.ndarray
+    span_line: np.ndarray
+    fonts: List[str]
+    paragraph_index: Dict[Paragraph, int] = field(default_factory=dict)
+
+    @property
+    def line_count(self) -> np.ndarray:
+        return np.diff(self.paragraph_line_offsets)
+
+    @property
+    def paragraph_valid(self) -> np.ndarray:
+        """Абзацы, у всех строк которых есть bbox (для остальных — скалярная проверка)"""
+        missing = np.isnan(self.line_bbox[:, 0]).astype(np.float64)
+        per_paragraph = segment_reduce(np.add, missing, self.paragraph_line_offsets)
+        return ~(per_paragraph > 0)
+
+    @property
+    def line_paragraph(self) -> np.ndarray:
+        """Номер абзаца для каждой строки"""
+        return np.repeat(np.arange(len(self.paragraphs)), self.line_count)
+
+    @classmethod
+    def from_pages(cls, pages: List[Page]) -> "ColumnStore":
+        paragraphs: List[Paragraph] = []
+        line_bbox: List[tuple] = []
+        paragraph_line_offsets = [0]
+        page_paragraph_offsets = [0]
+        span_bbox: List[tuple] = []
+        span_size: List[float] = []
+        span_font: List[int] = []
+        span_color: List[int] = []
+        span_line: List[int] = []
+        font_ids: Dict[str, int] = {}
+        nan_bbox = (np.nan, np.nan, np.nan, np.nan)
+
+        for page in pages:
+            for node in page.children:
+                if not isinstance(node, Paragraph):
+                    continue
+                paragraphs.append(node)
+                for line in node.children:
+                    line_index = len(line_bbox)
+                    line_bbox.append(line.bbox if line.bbox else nan_bbox)
+                    for span in _line_spans(line):
+                        span_bbox.append(span.bbox)
+                        span_size.append(span.size)
+                        span_font.append(font_ids.setdefault(span.real_font, len(font_ids)))
+                        span_color.append(-1 if span.color is None else span.color)
+                        span_line.append(line_index)
+                paragraph_line_offsets.append(len(line_bbox))
+            page_paragraph_offsets.append(len(paragraphs))
+
+        return cls(
+            paragraphs=paragraphs,
+            pages=list(pages),
+            line_bbox=np.array(line_bbox, dtype=np.float64).reshape(-1, 4),
+            paragraph_line_offsets=np.array(paragraph_line_offsets, dtype=np.int64),
+            page_paragraph_offsets=np.array(page_paragraph_offsets, dtype=np.int64),
+            span_bbox=np.array(span_bbox, dtype=np.float64).reshape(-1, 4),
+            span_size=np.array(span_size, dtype=np.float64),
+            span_font=np.array(span_font, dtype=np.int32),
+            span_color=np.array(span_color, dtype=np.int64),
+            span_line=np.array(span_line, dtype=np.int64),
+            fonts=list(font_ids),
+            paragraph_index={p: i for i, p in enumerate(paragraphs)},
+        )
+
+
+def _line_spans(line: Node):
+    """Спаны строки в порядке обхода, включая спаны внутри ссылок"""
+    for child in line.children:
+        if isinstance(child, Span):
+            yield child
+        else:
+            yield from (c for c in child.children if isinstance(c, Span))
+
+
+def store_of(root: Node) -> Optional[ColumnStore]:
+    """Колоночное хранилище, построенное парсером для документа или страницы"""
+    return getattr(root, "store", None)
+
+
+def segment_reduce(ufunc, values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    ufunc.reduceat по непустым сегментам [offsets[i], offsets[i + 1]).
+    Для пустых сегментов результат — NaN.
+    """
+    counts = np.diff(offsets)
+    result = np.full(len(counts), np.nan)
+    nonempty = counts > 0
+    if nonempty.any():
+        result[nonempty] = ufunc.reduceat(values, offsets[:-1][nonempty])
+    return result
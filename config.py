@@ -0,0 +1,98 @@
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return int(value)
+
+
+# Режим выполнения проверок: "process" — пул процессов, "thread" — в потоке
+# текущего процесса (для отладки и тестов)
+EXECUTOR_MODE = os.getenv("CHECKY_EXECUTOR", "process")
+if EXECUTOR_MODE not in ("process", "thread"):
+    raise ValueError(f'CHECKY_EXECUTOR: ожидается "process" или "thread", получено {EXECUTOR_MODE!r}')
+
+# Количество процессов-обработчиков (по умолчанию — число ядер)
+WORKERS = _env_int("CHECKY_WORKERS", os.cpu_count() or 1)
+
+# Максимальное число задач в очереди сверх занятых обработчиков
+QUEUE_SIZE = _env_int("CHECKY_QUEUE_SIZE", WORKERS * 4)
+
+# Перезапуск процесса-обработчика после N задач (0 — без перезапуска)
+MAX_TASKS_PER_WORKER = _env_int("CHECKY_MAX_TASKS_PER_WORKER", 100)
+
+# Максимальный размер одного загружаемого PDF, байт (проверяется по мере приёма)
+MAX_UPLOAD_BYTES = _env_int("CHECKY_MAX_UPLOAD_BYTES", 100 * 1024 * 1024)
+
+# Максимальный размер запроса /batch целиком, байт
+MAX_BATCH_BYTES = _env_int("CHECKY_MAX_BATCH_BYTES", 1024 * 1024 * 1024)
+
+# Каталог для временных файлов загрузок и результатов (пусто — системный)
+SPOOL_DIR = os.getenv("CHECKY_SPOOL_DIR", "")
+
+# Сохранение исправленного PDF: "incremental" — комментарии дописываются в конец
+# исходного файла, "full" — документ переписывается целиком
+RENDER_MODE = os.getenv("CHECKY_RENDER_MODE", "incremental")
+
+# Количество процессов для параллельного разбора страниц одного документа (1 — последовательно)
+PARSE_WORKERS = _env_int("CHECKY_PARSE_WORKERS", 1)
+
+# Минимальное число страниц, начиная с которого разбор распараллеливается
+PARSE_PARALLEL_MIN_PAGES = _env_int("CHECKY_PARSE_PARALLEL_MIN_PAGES", 32)
+
+# Число страниц, начиная с которого /validate проверяет документ постранично,
+# не держа в памяти всё дерево
+STREAM_MIN_PAGES = _env_int("CHECKY_STREAM_MIN_PAGES", 300)
+
+# Максимальное число PDF в одном запросе /batch (с учётом содержимого ZIP)
+BATCH_MAX_FILES = _env_int("CHECKY_BATCH_MAX_FILES", 200)
+
+# Версия набора правил и их настроек; входит в ключ кэша результатов
+RULESET_VERSION = os.getenv("CHECKY_RULESET_VERSION", "1")
+
+# Размер кэша результатов в памяти, байт (0 — кэш в памяти выключен)
+CACHE_MEMORY_BYTES = _env_int("CHECKY_CACHE_MEMORY_BYTES", 256 * 1024 * 1024)
+
+# Каталог дискового кэша результатов (пусто — дисковый кэш выключен)
+CACHE_DIR = os.getenv("CHECKY_CACHE_DIR", "")
+
+# Размер дискового кэша результатов, байт
+CACHE_DISK_BYTES = _env_int("CHECKY_CACHE_DISK_BYTES", 2 * 1024 * 1024 * 1024)
+
+# Строить колоночное хранилище строк/спанов и использовать векторизованные правила
+COLUMNAR = os.getenv("CHECKY_COLUMNAR", "1") != "0"
+
+# Файл SQLite с очередью фоновых задач /jobs
+JOBS_DB = os.getenv("CHECKY_JOBS_DB", "jobs.sqlite3")
+
+# Сколько задач из очереди сервер выполняет сам (0 — только отдельные обработчики jobs.py).
+# По умолчанию — половина обработчиков: остальные остаются для /upload и /validate
+JOB_WORKERS = _env_int("CHECKY_JOB_WORKERS", max(1, WORKERS // 2))
+
+# Время хранения результата задачи после завершения, секунд
+JOB_RESULT_TTL = _env_int("CHECKY_JOB_RESULT_TTL", 24 * 60 * 60)
+
+# Задача без отметок обработчика дольше этого времени считается брошенной
+# (обработчик упал) и возвращается в очередь, секунд
+JOB_STALE_SECONDS = _env_int("CHECKY_JOB_STALE_SECONDS", 600)
+
+# Сколько раз задача берётся в работу, прежде чем считается неудавшейся
+JOB_MAX_ATTEMPTS = _env_int("CHECKY_JOB_MAX_ATTEMPTS", 3)
+
+# Профилирование отдельных запросов (?profile=1): "1" — разрешено всем,
+# иначе — только с заголовком X-Profile-Token, равным CHECKY_PROFILE_TOKEN
+PROFILE_ENABLED = os.getenv("CHECKY_PROFILE", "0") == "1"
+
+# Токен для профилирования запросов (пусто — по токену не разрешается)
+PROFILE_TOKEN = os.getenv("CHECKY_PROFILE_TOKEN", "")
+
+# Каталог для сохранённых профилей (стеки вызовов в формате flamegraph)
+PROFILE_DIR = os.getenv("CHECKY_PROFILE_DIR", "profiles")
+
+# Сколько последних профилей хранить
+PROFILE_KEEP = _env_int("CHECKY_PROFILE_KEEP", 100)
+
+# Интервал снятия стека вызовов при профилировании, миллисекунд
+PROFILE_INTERVAL_MS = _env_int("CHECKY_PROFILE_INTERVAL_MS", 5)
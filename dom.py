@@ -1,118 +1,209 @@
 from dataclasses import dataclass, field
-from typing import List, Optional, Any, Tuple
+from typing import List, Optional, Any, Tuple, ClassVar, Iterator
 
-_node_id_counter = 0
+# Идентификаторы узлов выделяются по страницам: у узла страницы с индексом i
+# node_id = (i + 1) * NODE_ID_SPACE + позиция узла при обходе страницы
+# в глубину (у самой страницы — 0), у Document — 0. Они не зависят от запуска,
+# процесса и разбиения документа на куски, поэтому результаты страниц можно
+# считать отдельно и объединять или кэшировать без перенумерации.
+NODE_ID_SPACE = 10 ** 9
 
-def generate_node_id():
-    global _node_id_counter
-    _node_id_counter += 1
-    return _node_id_counter
+_EMPTY: Tuple = ()
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Node:
-    parent: Optional["Node"] = None
-    children: List["Node"] = field(default_factory=list)
-    orig: Any = None
-    node_type: str = "node"
-    errors: List[Any] = field(default_factory=list)
-    node_id: int = field(default_factory=generate_node_id)
+    """
+    Базовый узел DOM. Списки детей и ошибок создаются только при первом
+    добавлении: у большинства листьев (span) их нет, а чтение children
+    у такого узла возвращает пустой кортеж.
+    Узел хранит свою позицию в children родителя (_index), поэтому переход
+    к соседям не требует поиска по списку.
+    """
+    parent: Optional["Node"] = field(default=None, repr=False)
+    orig: Any = field(default=None, repr=False)
+    node_id: int = 0
+    _children: Optional[List["Node"]] = field(default=None, init=False, repr=False)
+    _errors: Optional[List[Any]] = field(default=None, init=False, repr=False)
+    _index: int = field(default=-1, init=False, repr=False)
+
+    node_type: ClassVar[str] = "node"
+
+    @property
+    def children(self) -> List["Node"]:
+        return self._children if self._children is not None else _EMPTY
+
+    @children.setter
+    def children(self, nodes: List["Node"]):
+        self._children = list(nodes) if nodes else None
+        for i, node in enumerate(self.children):
+            node._index = i
+
+    @property
+    def errors(self) -> List[Any]:
+        if self._errors is None:
+            self._errors = []
+        return self._errors
+
+    @errors.setter
+    def errors(self, errors: List[Any]):
+        self._errors = list(errors) if errors else None
 
     def add_child(self, node: "Node"):
         node.parent = self
-        self.children.append(node)
+        if self._children is None:
+            node._index = 0
+            self._children = [node]
+        else:
+            node._index = len(self._children)
+            self._children.append(node)
 
     def replace_child(self, old_node: "Node", new_node: "Node"):
         """
         Заменяет old_node на new_node в children.
         Безопасно, без рекурсивных сравнений.
         """
-        for i, child in enumerate(self.children):
-            if child is old_node:
-                new_node.parent = self
-                self.children[i] = new_node
-                old_node.parent = None
-                return True
-        return False
+        if old_node.parent is not self:
+            return False
+        i = old_node.position
+        if i < 0:
+            return False
+        new_node.parent = self
+        new_node._index = i
+        self._children[i] = new_node
+        old_node.parent = None
+        old_node._index = -1
+        return True
+
+    @property
+    def position(self) -> int:
+        """Позиция узла в children родителя (-1, если родителя нет)"""
+        if self.parent is None:
+            return -1
+        siblings = self.parent.children
+        i = self._index
+        if 0 <= i < len(siblings) and siblings[i] is self:
+            return i
+        # список детей изменили в обход add_child/replace_child
+        for i, child in enumerate(siblings):
+            child._index = i
+        return self._index if self._index < len(siblings) and siblings[self._index] is self else -1
 
     @property
     def next_sibling(self) -> Optional["Node"]:
-        if not self.parent:
+        i = self.position
+        if i < 0:
             return None
         siblings = self.parent.children
-        idx = siblings.index(self)
-        if idx + 1 < len(siblings):
-            return siblings[idx + 1]
+        if i + 1 < len(siblings):
+            return siblings[i + 1]
         return None
 
     @property
     def prev_sibling(self) -> Optional["Node"]:
-        if not self.parent:
+        i = self.position
+        if i <= 0:
             return None
+        return self.parent.children[i - 1]
+
+    def following_siblings(self) -> Iterator["Node"]:
+        """Соседи после узла, по порядку"""
+        i = self.position
+        if i < 0:
+            return
         siblings = self.parent.children
-        idx = siblings.index(self)
-        if idx - 1 >= 0:
-            return siblings[idx - 1]
-        return None
+        for j in range(i + 1, len(siblings)):
+            yield siblings[j]
+
+    def preceding_siblings(self) -> Iterator["Node"]:
+        """Соседи перед узлом, от ближайшего к первому"""
+        i = self.position
+        if i < 0:
+            return
+        siblings = self.parent.children
+        for j in range(i - 1, -1, -1):
+            yield siblings[j]
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Span(Node):
     text: str = ""
     font: str = ""
+    real_font: str = ""
     size: float = 0.0
     bbox: Tuple[float, float, float, float] = (0,0,0,0)
-    node_type: str = "span"
+    color: Optional[int] = None
+    flags: int = 0
+    node_type: ClassVar[str] = "span"
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Line(Node):
     spans: List[Span] = field(default_factory=list)
     bbox: Tuple[float, float, float, float] = (0,0,0,0)
-    node_type: str = "line"
-    orig: None
+    node_type: ClassVar[str] = "line"
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Paragraph(Node):
     bbox: Tuple[float, float, float, float] = (0,0,0,0)
     style: str = "normal"
-    node_type: str = "paragraph"
+    node_type: ClassVar[str] = "paragraph"
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class PageNumber(Node):
     text: str = ""
     bbox: Tuple[float, float, float, float] = (0, 0, 0, 0)
-    node_type: str = "page_number"
+    node_type: ClassVar[str] = "page_number"
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Heading(Node):
     level: int = 1
     text: str = ""
     bbox: Tuple[float, float, float, float] = (0,0,0,0)
-    node_type: str = "heading"
+    node_type: ClassVar[str] = "heading"
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Table(Node):
     bbox: Tuple[float, float, float, float] = (0,0,0,0)
     raw_data: dict = field(default_factory=dict)
-    node_type: str = "table"
+    node_type: ClassVar[str] = "table"
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class ImageObject(Node):
     bbox: Tuple[float, float, float, float] = (0,0,0,0)
-    image_bytes: bytes = b""
-    node_type: str = "image"
+    node_type: ClassVar[str] = "image"
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Link(Node):
     uri: str = ""
     bbox: Tuple[float, float, float, float] = (0,0,0,0)
-    node_type: str = "link"
+    node_type: ClassVar[str] = "link"
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Page(Node):
     number: int = 0
     bbox: Tuple[float, float, float, float] = (0,0,0,0)
-    node_type: str = "page"
+    store: Any = field(default=None, repr=False)
+    index: Any = field(default=None, repr=False)
+    node_type: ClassVar[str] = "page"
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class Document(Node):
     pages: List[Page] = field(default_factory=list)
-    node_type: str = "document"
+    store: Any = field(default=None, repr=False)
+    node_type: ClassVar[str] = "document"
+
+
+def page_of(node: Optional[Node]) -> Optional[Page]:
+    """Страница, которой принадлежит узел (или None, если узел вне страниц)"""
+    while node is not None and not isinstance(node, Page):
+        node = node.parent
+    return node
+
+
+def assign_node_ids(page: Page):
+    """Нумерует узлы страницы (см. NODE_ID_SPACE)"""
+    next_id = (page.number + 1) * NODE_ID_SPACE
+    stack = [page]
+    while stack:
+        node = stack.pop()
+        node.node_id = next_id
+        next_id += 1
+        stack.extend(reversed(node.children))
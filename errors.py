@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from typing import Optional
-from dom import Node
+from dom import Node, page_of
 
 class ErrorType:
     FONT = "font"
@@ -25,3 +25,16 @@ class RuleError:
     error_type: str = ErrorType.GENERAL
     expected: Optional[str] = None
     found: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        """Компактное представление ошибки для JSON-ответа"""
+        page = page_of(self.node)
+        bbox = getattr(self.node, "bbox", None)
+        return {
+            "page": page.number if page is not None else None,
+            "bbox": [round(v, 2) for v in bbox] if bbox else None,
+            "type": self.error_type,
+            "message": self.message,
+            "expected": self.expected,
+            "found": self.found,
+        }
@@ -0,0 +1,208 @@
+import asyncio
+import multiprocessing
+import queue
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+import metrics
+
+
+class QueueFullError(Exception):
+    """Очередь задач заполнена, новая задача не принята"""
+
+
+class WorkerCrashedError(Exception):
+    """Процесс-обработчик аварийно завершился во время выполнения задачи"""
+
+
+_STREAM_ITEM = "item"
+_STREAM_METRICS = "metrics"
+_STREAM_END = "end"
+
+
+def _stream_to_queue(out_queue, stop, fn, args, collect_metrics=False):
+    """
+    Выполняется в обработчике: перекладывает элементы генератора fn(*args) в очередь.
+    Установленный stop прерывает генератор перед следующим элементом.
+    collect_metrics — перед концом передать и метрики, накопленные обработчиком.
+    """
+    if collect_metrics:
+        metrics.reset()
+    items = fn(*args)
+    try:
+        for item in items:
+            if stop.is_set():
+                break
+            out_queue.put((_STREAM_ITEM, item))
+    finally:
+        items.close()
+    if collect_metrics:
+        out_queue.put((_STREAM_METRICS, metrics.export()))
+    out_queue.put((_STREAM_END, None))
+
+
+class PDFExecutor:
+    """
+    Выполняет тяжёлые функции обработки PDF вне event loop.
+    В режиме "process" задачи уходят в пул процессов: падение MuPDF
+    убивает только процесс-обработчик, пул пересоздаётся при следующей задаче.
+    В режиме "thread" задачи выполняются в потоке (для отладки и тестов).
+    Метрики, накопленные обработчиком за задачу, возвращаются вместе
+    с результатом и добавляются к метрикам сервера.
+    """
+
+    def __init__(self,
+                 mode: str = config.EXECUTOR_MODE,
+                 workers: int = config.WORKERS,
+                 queue_size: int = config.QUEUE_SIZE,
+                 max_tasks_per_worker: int = config.MAX_TASKS_PER_WORKER):
+        if mode not in ("process", "thread"):
+            raise ValueError(f"Неизвестный режим выполнения: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_size)
+        self.max_tasks_per_worker = max_tasks_per_worker or None
+        self._slots = asyncio.Semaphore(self.capacity)
+        self._in_flight = 0
+        self._waiting = 0
+        self._pool: ProcessPoolExecutor | None = None
+        self._manager = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.max_tasks_per_worker,
+            )
+        return self._pool
+
+    def _get_manager(self):
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager
+
+    def _make_queue(self):
+        if self.mode == "thread":
+            return queue.Queue()
+        return self._get_manager().Queue()
+
+    def _make_event(self):
+        if self.mode == "thread":
+            return threading.Event()
+        return self._get_manager().Event()
+
+    def _reset_pool(self, pool: ProcessPoolExecutor):
+        if self._pool is pool:
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn, *args, wait: bool = False):
+        """
+        Выполняет fn(*args) в обработчике.
+        Если все обработчики заняты и очередь заполнена — QueueFullError,
+        при wait=True — ожидание свободного места в очереди.
+        """
+        if not wait and self._slots.locked():
+            raise QueueFullError("Очередь задач заполнена")
+
+        async with self._slot():
+            if self.mode == "thread":
+                return await asyncio.to_thread(fn, *args)
+
+            pool = self._get_pool()
+            loop = asyncio.get_running_loop()
+            try:
+                result, state = await loop.run_in_executor(pool, metrics.collecting, fn, *args)
+            except BrokenProcessPool as e:
+                self._reset_pool(pool)
+                raise WorkerCrashedError("Процесс-обработчик аварийно завершился") from e
+            metrics.merge(state)
+            return result
+
+    @asynccontextmanager
+    async def _slot(self):
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    def is_full(self) -> bool:
+        return self._slots.locked()
+
+    @property
+    def busy(self) -> int:
+        """Сколько обработчиков сейчас заняты"""
+        return min(self._in_flight, self.workers)
+
+    @property
+    def queued(self) -> int:
+        """Сколько задач ждут свободного обработчика (в очереди пула и перед ней)"""
+        return max(0, self._in_flight - self.workers) + self._waiting
+
+    async def stream(self, fn, *args):
+        """
+        Выполняет генератор fn(*args) в обработчике и отдаёт его элементы
+        по мере готовности. Элементы передаются через очередь, поэтому
+        должны сериализоваться pickle.
+        Как и run(), при заполненной очереди — QueueFullError (при получении
+        первого элемента). Если генератор закрыт раньше конца (клиент ушёл),
+        обработчик останавливается перед следующим элементом, а место
+        в очереди освобождается, только когда он действительно закончит.
+        """
+        if self._slots.locked():
+            raise QueueFullError("Очередь задач заполнена")
+
+        async with self._slot():
+            loop = asyncio.get_running_loop()
+            out_queue = self._make_queue()
+            stop = self._make_event()
+            pool = None if self.mode == "thread" else self._get_pool()
+            future = loop.run_in_executor(pool, _stream_to_queue, out_queue, stop, fn, args, pool is not None)
+
+            try:
+                while True:
+                    try:
+                        kind, item = await loop.run_in_executor(None, out_queue.get, True, 0.2)
+                    except queue.Empty:
+                        if future.done():
+                            break
+                        continue
+                    if kind == _STREAM_END:
+                        break
+                    if kind == _STREAM_METRICS:
+                        metrics.merge(item)
+                        continue
+                    yield item
+            finally:
+                stop.set()
+                try:
+                    await future
+                except BrokenProcessPool as e:
+                    self._reset_pool(pool)
+                    raise WorkerCrashedError("Процесс-обработчик аварийно завершился") from e
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+executor = PDFExecutor()
+
+metrics.Gauge("checky_queue_depth", "Задачи, ожидающие свободного обработчика", fn=lambda: executor.queued)
+metrics.Gauge("checky_workers_busy", "Занятые обработчики", fn=lambda: executor.busy)
+metrics.Gauge("checky_workers", "Число обработчиков", fn=lambda: executor.workers)
@@ -0,0 +1,416 @@
+"""
+Очередь фоновых задач проверки на SQLite.
+
+Задачи ставит в очередь API (POST /jobs), забирают их обработчики:
+встроенный в сервер JobRunner (через пул обработчиков executor) и/или
+отдельные процессы, запущенные командой
+
+    python jobs.py --workers 4
+
+Все они работают с одним файлом базы, поэтому задачу получает ровно один.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+import config
+from executor import PDFExecutor, executor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    filename TEXT,
+    input BLOB,
+    result BLOB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    pages_done INTEGER NOT NULL DEFAULT 0,
+    pages_total INTEGER,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at);
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Вид задачи → (функция обработки, MIME-тип результата, вид результата в кэше)
+KINDS = {
+    "render": ("process_pdf", "application/pdf", "render"),
+    "json": ("validate_pdf_json", "application/json", "report"),
+}
+
+PROGRESS_INTERVAL = 1.0
+POLL_INTERVAL = 1.0
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts is not None else None
+
+
+class JobStore:
+    """Таблица задач в SQLite; каждая операция — отдельное короткое соединение"""
+
+    def __init__(self, path: str = config.JOBS_DB):
+        self.path = path
+        with self._db() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        with closing(sqlite3.connect(self.path, timeout=30, isolation_level=None)) as db:
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            yield db
+
+    def submit(self, kind: str, filename: str, data: bytes) -> str:
+        job_id = uuid.uuid4().hex
+        with self._db() as db:
+            db.execute(
+                "INSERT INTO jobs (id, kind, status, filename, input, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, filename, data, time.time()),
+            )
+        return job_id
+
+    def submit_done(self, kind: str, filename: str, result: bytes) -> str:
+        """Задача, результат которой уже известен (например, из кэша)"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT INTO jobs (id, kind, status, filename, result, created_at, started_at,"
+                " finished_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, DONE, filename, result, now, now, now, now + config.JOB_RESULT_TTL),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Состояние задачи для GET /jobs/{id} (None — нет такой или результат истёк)"""
+        with self._db() as db:
+            row = db.execute(
+                "SELECT id, kind, status, filename, error, pages_done, pages_total,"
+                " created_at, started_at, finished_at, expires_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None or (row["expires_at"] is not None and row["expires_at"] < time.time()):
+            return None
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "filename": row["filename"],
+            "progress": {"pages_done": row["pages_done"], "pages_total": row["pages_total"]},
+            "error": row["error"],
+            "created_at": _iso(row["created_at"]),
+            "started_at": _iso(row["started_at"]),
+            "finished_at": _iso(row["finished_at"]),
+            "expires_at": _iso(row["expires_at"]),
+        }
+
+    def result(self, job_id: str) -> Optional[bytes]:
+        with self._db() as db:
+            row = db.execute(
+                "SELECT result FROM jobs WHERE id = ? AND status = ? AND expires_at >= ?",
+                (job_id, DONE, time.time()),
+            ).fetchone()
+        return row["result"] if row is not None else None
+
+    def claim(self, worker: str) -> Optional[str]:
+        """Берёт в работу самую старую задачу из очереди"""
+        now = time.time()
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1,"
+                " started_at = ?, heartbeat_at = ? WHERE id = ?",
+                (RUNNING, worker, now, now, row["id"]),
+            )
+            db.execute("COMMIT")
+        return row["id"]
+
+    def load(self, job_id: str) -> tuple[str, bytes]:
+        with self._db() as db:
+            row = db.execute("SELECT kind, input FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["kind"], row["input"]
+
+    def progress(self, job_id: str, worker: str, done: int, total: int):
+        with self._db() as db:
+            db.execute(
+                "UPDATE jobs SET pages_done = ?, pages_total = ?, heartbeat_at = ?"
+                " WHERE id = ? AND worker = ? AND status = ?",
+                (done, total, time.time(), job_id, worker, RUNNING),
+            )
+
+    def touch(self, job_id: str, worker: str):
+        """Отметка, что задача ещё выполняется"""
+        with self._db() as db:
+            db.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                       (time.time(), job_id, worker, RUNNING))
+
+    def finish(self, job_id: str, worker: str, result: bytes) -> bool:
+        """
+        Сохраняет результат. Ничего не меняет (и возвращает False), если
+        задачу уже вернули в очередь и её взял другой обработчик.
+        """
+        now = time.time()
+        with self._db() as db:
+            cur = db.execute(
+                "UPDATE jobs SET status = ?, result = ?, input = NULL, error = NULL,"
+                " finished_at = ?, expires_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (DONE, result, now, now + config.JOB_RESULT_TTL, job_id, worker, RUNNING),
+            )
+        return cur.rowcount > 0
+
+    def fail(self, job_id: str, worker: str, error: str) -> bool:
+        now = time.time()
+        with self._db() as db:
+            cur = db.execute(
+                "UPDATE jobs SET status = ?, error = ?, input = NULL,"
+                " finished_at = ?, expires_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (FAILED, error, now, now + config.JOB_RESULT_TTL, job_id, worker, RUNNING),
+            )
+        return cur.rowcount > 0
+
+    def retry_or_fail(self, job_id: str, worker: str, error: str):
+        """Обработчик упал: задача возвращается в очередь, пока не исчерпаны попытки"""
+        with self._db() as db:
+            cur = db.execute(
+                "UPDATE jobs SET status = ?, worker = NULL"
+                " WHERE id = ? AND worker = ? AND status = ? AND attempts < ?",
+                (QUEUED, job_id, worker, RUNNING, config.JOB_MAX_ATTEMPTS),
+            )
+        if cur.rowcount == 0:
+            self.fail(job_id, worker, error)
+
+    def maintain(self):
+        """Удаляет истёкшие задачи и возвращает в очередь брошенные"""
+        now = time.time()
+        with self._db() as db:
+            db.execute("DELETE FROM jobs WHERE expires_at < ?", (now,))
+            stale = db.execute(
+                "SELECT id, worker FROM jobs WHERE status = ? AND heartbeat_at < ?",
+                (RUNNING, now - config.JOB_STALE_SECONDS),
+            ).fetchall()
+        for row in stale:
+            self.retry_or_fail(row["id"], row["worker"], "Обработчик задачи аварийно завершился")
+
+
+def _claim_id(worker_id: str) -> str:
+    """
+    Метка одного взятия задачи. Своя на каждый claim, чтобы обработчик,
+    у которого задачу забрали как брошенную, не мог перезаписать её,
+    даже если её снова взял тот же процесс.
+    """
+    return f"{worker_id}/{uuid.uuid4().hex[:8]}"
+
+
+class _Lease:
+    """
+    Пока задача выполняется, фоновый поток обновляет heartbeat_at
+    (раз в четверть JOB_STALE_SECONDS). Задача не считается брошенной,
+    пока жив её обработчик, на каком бы этапе она ни была: разбор,
+    отрисовка или запись результата.
+    """
+
+    def __init__(self, store: JobStore, job_id: str, worker: str):
+        self.store = store
+        self.job_id = job_id
+        self.worker = worker
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "_Lease":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(config.JOB_STALE_SECONDS / 4):
+            try:
+                self.store.touch(self.job_id, self.worker)
+            except sqlite3.Error:
+                pass
+
+
+def run_job(db_path: str, job_id: str, worker: str):
+    """
+    Выполняет взятую задачу: в процессе пула executor или в отдельном
+    обработчике. Прогресс (страницы) и результат пишутся прямо в базу,
+    только пока задача числится за worker — метка, выданная при claim.
+    """
+    import processor
+
+    store = JobStore(db_path)
+    kind, data = store.load(job_id)
+    fn_name, _, _ = KINDS[kind]
+    last_report = 0.0
+
+    def progress(done: int, total: int):
+        nonlocal last_report
+        now = time.monotonic()
+        if done == total or now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            store.progress(job_id, worker, done, total)
+
+    with _Lease(store, job_id, worker):
+        try:
+            result = getattr(processor, fn_name)(data, progress=progress)
+        except Exception as e:
+            store.fail(job_id, worker, f"Ошибка обработки PDF: {e}")
+            return
+        store.finish(job_id, worker, result)
+
+
+class JobRunner:
+    """
+    Выполняет задачи из очереди внутри сервера: берёт не больше concurrency
+    задач одновременно и отправляет их в пул обработчиков executor.
+    """
+
+    def __init__(self, store: JobStore, pool: PDFExecutor = executor,
+                 concurrency: int = config.JOB_WORKERS):
+        self.store = store
+        self.executor = pool
+        self.concurrency = concurrency
+        self.worker_id = f"api-{os.getpid()}"
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.concurrency > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        """Новая задача в очереди — не ждать следующего опроса"""
+        self._wakeup.set()
+
+    async def _loop(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        running = set()
+        last_maintenance = 0.0
+        while True:
+            if time.monotonic() - last_maintenance >= POLL_INTERVAL * 30:
+                last_maintenance = time.monotonic()
+                await asyncio.to_thread(self.store.maintain)
+
+            await slots.acquire()
+            worker = _claim_id(self.worker_id)
+            job_id = await asyncio.to_thread(self.store.claim, worker)
+            if job_id is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            task = asyncio.create_task(self._run(job_id, worker, slots))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+    async def _run(self, job_id: str, worker: str, slots: asyncio.Semaphore):
+        try:
+            await self.executor.run(run_job, self.store.path, job_id, worker, wait=True)
+        except Exception as e:
+            await asyncio.to_thread(self.store.retry_or_fail, job_id, worker, f"Ошибка обработки PDF: {e}")
+        finally:
+            slots.release()
+
+
+_store: Optional[JobStore] = None
+_runner: Optional[JobRunner] = None
+
+
+def get_store() -> JobStore:
+    """Очередь сервера; база создаётся при первом обращении"""
+    global _store
+    if _store is None:
+        _store = JobStore()
+    return _store
+
+
+def get_runner() -> JobRunner:
+    global _runner
+    if _runner is None:
+        _runner = JobRunner(get_store())
+    return _runner
+
+
+def worker_loop(db_path: str):
+    """Цикл отдельного обработчика: забирает задачи, пока процесс не остановят"""
+    store = JobStore(db_path)
+    worker_id = f"worker-{os.getpid()}"
+    last_maintenance = 0.0
+    while True:
+        if time.monotonic() - last_maintenance >= POLL_INTERVAL * 30:
+            last_maintenance = time.monotonic()
+            store.maintain()
+        worker = _claim_id(worker_id)
+        job_id = store.claim(worker)
+        if job_id is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        run_job(db_path, job_id, worker)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обработчики очереди задач проверки PDF")
+    parser.add_argument("--db", default=config.JOBS_DB, help="файл базы очереди")
+    parser.add_argument("--workers", type=int, default=config.WORKERS, help="число процессов")
+    args = parser.parse_args()
+
+    JobStore(args.db)
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    try:
+        while True:
+            # упавший процесс (например, из-за сбоя MuPDF) перезапускается
+            processes = [p for p in processes if p.is_alive()]
+            while len(processes) < args.workers:
+                process = context.Process(target=worker_loop, args=(args.db,))
+                process.start()
+                processes.append(process)
+            time.sleep(POLL_INTERVAL)
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,30 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from routes import router
+from executor import executor
+from jobs import get_runner
+from uploads import UploadLimitMiddleware
+import config
+import metrics
 import uvicorn
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    runner = get_runner()
+    runner.start()
+    yield
+    await runner.stop()
+    executor.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# размер тела ограничивается во время приёма, до разбора multipart
+app.add_middleware(UploadLimitMiddleware, limits={"/batch": config.MAX_BATCH_BYTES})
+app.add_middleware(metrics.RequestMetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,7 +32,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["content-disposition"],
+    expose_headers=["content-disposition", "etag", "location", "server-timing", "x-profile"],
 )
 
 app.include_router(router)
@@ -0,0 +1,280 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Границы корзин гистограмм длительностей, секунд
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+    def export(self) -> Dict[LabelValues, object]:
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик с необязательными метками"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def merge(self, values: Dict[LabelValues, float]):
+        with self._lock:
+            for key, amount in values.items():
+                self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    Текущее значение. fn — функция без аргументов, значение которой берётся
+    в момент чтения метрик (для величин, которые и так известны, например
+    размера очереди) — тогда set() не нужен.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        if self.fn is not None:
+            return self.fn()
+        return self._values.get(self._key(labels), 0)
+
+    def merge(self, values: Dict[LabelValues, float]):
+        """Значения из обработчиков не переносятся: они относятся к процессу обработчика"""
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        if self.fn is not None:
+            lines.append(f"{self.name} {_format_value(self.fn())}")
+            return lines
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """
+    Распределение значений по корзинам (накопительно, как в Prometheus).
+    Значение по меткам — список: число попаданий в каждую корзину
+    (последняя — +Inf), затем сумма и количество наблюдений.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[-1] if state is not None else 0
+
+    def export(self) -> Dict[LabelValues, list]:
+        with self._lock:
+            return {key: list(state) for key, state in self._values.items()}
+
+    def merge(self, values: Dict[LabelValues, list]):
+        with self._lock:
+            for key, other in values.items():
+                state = self._values.get(key)
+                if state is None:
+                    self._values[key] = list(other)
+                else:
+                    for i, value in enumerate(other):
+                        state[i] += value
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            cumulative = 0
+            for bound, hits in zip(self.buckets + (float("inf"),), state):
+                cumulative += hits
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.labels + ("le",), key + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def export() -> Dict[str, dict]:
+    """Накопленные значения процесса — для передачи из обработчика в сервер"""
+    return {metric.name: values for metric in REGISTRY if (values := metric.export())}
+
+
+def merge(state: Optional[Dict[str, dict]]):
+    """Добавляет значения, накопленные в обработчике (результат export())"""
+    if not state:
+        return
+    by_name = {metric.name: metric for metric in REGISTRY}
+    for name, values in state.items():
+        metric = by_name.get(name)
+        if metric is not None:
+            metric.merge(values)
+
+
+def reset():
+    for metric in REGISTRY:
+        metric.reset()
+
+
+def collecting(fn, *args):
+    """
+    Выполняется в процессе-обработчике: fn(*args) и метрики, накопленные
+    за время выполнения. Обработчик выполняет одну задачу за раз, поэтому
+    всё накопленное с начала вызова относится к этой задаче.
+    """
+    reset()
+    result = fn(*args)
+    return result, export()
+
+
+REGISTRY: List[_Metric] = []
+
+CACHE_HITS = Counter("checky_cache_hits_total", "Попадания в кэш результатов", ("tier",))
+CACHE_MISSES = Counter("checky_cache_misses_total", "Промахи кэша результатов")
+
+REQUEST_SECONDS = Histogram(
+    "checky_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route", "status")
+)
+OPEN_SECONDS = Histogram("checky_open_duration_seconds", "Время открытия PDF")
+PARSE_SECONDS = Histogram("checky_parse_duration_seconds", "Время разбора документа")
+RULE_SECONDS = Histogram("checky_rule_duration_seconds", "Время проверки правилом", ("rule",))
+RENDER_SECONDS = Histogram("checky_render_duration_seconds", "Время отрисовки ошибок в PDF")
+
+PAGES = Counter("checky_pages_total", "Разобранные страницы")
+SPANS = Counter("checky_spans_total", "Разобранные фрагменты текста (spans)")
+RULE_ERRORS = Counter("checky_rule_errors_total", "Найденные нарушения", ("rule",))
+
+
+class RequestMetricsMiddleware:
+    """
+    Время обработки HTTP-запросов — до отправки ответа целиком (для потоковых
+    ответов — до конца потока). Метка route — шаблон пути (/jobs/{job_id}),
+    а не сам путь, чтобы число рядов не росло с числом запросов.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
@@ -1,5 +1,14 @@
 import fitz
+import os
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
 from dom import *
+from columnar import ColumnStore
+from spatial import GridIndex, build_page_index
+import config
+import metrics
 
 CM_TO_PT = 28.35
 RED_INDENT_CM = 0.1
@@ -7,36 +16,200 @@ PAGE_LEFT_CM = 3
 
 fitz.TOOLS.set_subset_fontnames(False)
 
+# Флаги извлечения текста: как у get_text("dict"), но без блоков изображений —
+# иначе MuPDF декодирует и копирует в результат содержимое каждой картинки.
+# Геометрия изображений берётся отдельно из page.get_image_info().
+TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# Что извлекает разбор. Правила объявляют нужное им в Rule.requires,
+# и разбор пропускает то, что не нужно ни одному из выбранных правил:
+#   spans        — текст: абзацы, строки, фрагменты (извлекается всегда)
+#   links        — ссылки; спаны внутри ссылок меняют геометрию строк
+#   images       — изображения (отдельный проход по содержимому страницы)
+#   page_numbers — выделение номера страницы из последнего абзаца
+#   columns      — колоночное хранилище строк и спанов
+#   spatial      — пространственный индекс узлов страницы (Page.index)
+FEATURES = frozenset({"spans", "links", "images", "page_numbers", "columns", "spatial"})
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_workers = 0
+
+
+def _get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    global _parse_pool, _parse_pool_workers
+    if _parse_pool is None or _parse_pool_workers != workers:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False)
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        _parse_pool_workers = workers
+    return _parse_pool
+
+
+def _split_pages(page_count: int, parts: int) -> List[Tuple[int, int]]:
+    """Делит диапазон страниц на parts непрерывных кусков примерно равного размера"""
+    parts = max(1, min(parts, page_count))
+    step, rest = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        stop = start + step + (1 if i < rest else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def open_pdf(source) -> fitz.Document:
+    """Открывает PDF из байтов или из файла (путь): файл MuPDF читает по мере надобности"""
+    if isinstance(source, (str, os.PathLike)):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _parse_page_range(source, start: int, stop: int,
+                      features: frozenset = FEATURES) -> List[Page]:
+    """
+    Разбирает страницы [start, stop) в процессе-обработчике.
+    Документ открывается заново, ссылки на fitz.Page из результата убираются,
+    чтобы страницы можно было передать обратно в основной процесс.
+    """
+    parser = PDFDOMParser(workers=1, features=features)
+    doc_pdf = open_pdf(source)
+    try:
+        pages = []
+        for page_index in range(start, stop):
+            page_node = parser._parse_page(doc_pdf[page_index], page_index)
+            page_node.orig = None
+            pages.append(page_node)
+        return pages
+    finally:
+        doc_pdf.close()
+
+
 class PDFDOMParser:
 
-    def parse_bytes(self, input_bytes: bytes, debug_page: int = None) -> Document:
-        doc_pdf = fitz.open(stream=input_bytes, filetype="pdf")
-        root = Document()
+    def __init__(self, workers: int = config.PARSE_WORKERS,
+                 parallel_min_pages: int = config.PARSE_PARALLEL_MIN_PAGES,
+                 columnar: bool = config.COLUMNAR,
+                 features=None):
+        """features — что извлекать (подмножество FEATURES, None — всё)"""
+        self.workers = workers
+        self.parallel_min_pages = parallel_min_pages
+        self.features = FEATURES if features is None else frozenset(features) | {"spans"}
+        unknown = self.features - FEATURES
+        if unknown:
+            raise ValueError(f"Неизвестные возможности разбора: {', '.join(sorted(unknown))}")
+        self.columnar = columnar and "columns" in self.features
+
+    def parse_bytes(self, source, debug_page: int = None) -> Document:
+        """source — байты PDF или путь к файлу"""
+        doc_pdf = open_pdf(source)
+        return self.parse_document(doc_pdf, source, debug_page=debug_page)
+
+    def parse_document(self, doc_pdf: fitz.Document, source=None,
+                       debug_page: int = None, progress=None) -> Document:
+        """
+        Разбирает уже открытый документ. Документ не закрывается — им владеет вызывающий.
+        Параллельный разбор возможен только при известном источнике (байты или путь).
+        progress(done, total) вызывается по мере разбора страниц.
+        """
+        total = doc_pdf.page_count
+        if (source is not None and self.workers > 1
+                and total >= max(2, self.parallel_min_pages)):
+            root = self._parse_parallel(source, doc_pdf)
+            if progress is not None:
+                progress(total, total)
+        else:
+            root = Document()
+            for page_node in self.iter_pages(doc_pdf, root):
+                if progress is not None:
+                    progress(page_node.number + 1, total)
+
+        if self.columnar:
+            root.store = ColumnStore.from_pages(root.pages)
+
+        if debug_page is not None and 0 <= debug_page < len(root.pages):
+            self.debug_page(root.pages[debug_page])
+
+        return root
 
-        for page_index, page in enumerate(doc_pdf):
-            page_node = Page(number=page_index, bbox=(0, 0, page.rect.width, page.rect.height), orig=page)
-            root.add_child(page_node)
-            root.pages.append(page_node)
 
-            self._parse_page_content(page, page_node)
+    def iter_pages(self, doc_pdf: fitz.Document, root: Document,
+                   page_stores: bool = False, keep_pages: bool = True) -> Iterator[Page]:
+        """
+        Последовательно разбирает страницы, добавляет их в root и отдаёт
+        каждую сразу после разбора — для потоковой проверки.
+        page_stores — строить колоночное хранилище для каждой страницы отдельно.
+        keep_pages=False — не добавлять страницы в root,
+        чтобы страница освобождалась, как только её отпустит вызывающий.
+        """
+        for page_index, page in enumerate(doc_pdf):
+            page_node = self._parse_page(page, page_index)
+            if page_stores and self.columnar:
+                page_node.store = ColumnStore.from_pages([page_node])
+            if keep_pages:
+                root.add_child(page_node)
+                root.pages.append(page_node)
+            yield page_node
+
+
+    def parse_page(self, doc_pdf: fitz.Document, page_index: int) -> Page:
+        """Разбор одной страницы вне дерева документа — для проверки отдельных страниц"""
+        page_node = self._parse_page(doc_pdf[page_index], page_index)
+        if self.columnar:
+            page_node.store = ColumnStore.from_pages([page_node])
+        return page_node
+
+
+    def _parse_parallel(self, source, doc_pdf) -> Document:
+        """
+        Разбор страниц по кускам в пуле процессов.
+        Куски собираются в исходном порядке страниц; node_id узлов зависят
+        только от страницы, поэтому результат не зависит от числа процессов.
+        """
+        pool = _get_parse_pool(self.workers)
+        futures = [
+            pool.submit(metrics.collecting, _parse_page_range, source, start, stop, self.features)
+            for start, stop in _split_pages(doc_pdf.page_count, self.workers)
+        ]
 
-            if debug_page is not None and page_index == debug_page:
-                self.debug_page(page_node)
+        root = Document()
+        for future in futures:
+            pages, state = future.result()
+            metrics.merge(state)
+            for page_node in pages:
+                page_node.orig = doc_pdf[page_node.number]
+                root.add_child(page_node)
+                root.pages.append(page_node)
 
         return root
 
 
-    def _parse_page_content(self, page, page_node: Page):
-        links = page.get_links()
-        link_rects = [(fitz.Rect(l["from"]), l["uri"]) for l in links]
+    def _parse_page(self, page, page_index: int) -> Page:
+        page_node = Page(number=page_index, bbox=(0, 0, page.rect.width, page.rect.height), orig=page)
+        self._parse_page_content(page, page_node)
+        assign_node_ids(page_node)
+        metrics.PAGES.inc()
+        return page_node
+
 
-        dict_data = page.get_text("dict")["blocks"]
+    def _parse_page_content(self, page, page_node: Page):
+        link_index = GridIndex(bounds=tuple(page.rect))
+        if "links" in self.features:
+            for l in page.get_links():
+                lrect = tuple(l["from"])
+                link_index.insert(lrect, (lrect, l["uri"]))
+
+        dict_data = self._extract_blocks(page)
+        metrics.SPANS.inc(sum(len(line["spans"]) for block in dict_data for line in block.get("lines", ())))
         sorted_blocks = self.sort_blocks_by_y(dict_data)
 
         for block in sorted_blocks:
             btype = block.get("type", 0)
             if btype == 0:
-                para = self._parse_text_block(block, link_rects)
+                para = self._parse_text_block(block, link_index)
                 if para:
                     page_node.add_child(para)
             elif btype == 1:
@@ -45,14 +218,42 @@ class PDFDOMParser:
                     page_node.add_child(img_node)
 
             elif btype == 2:
-                table_node = Table(bbox=tuple(block["bbox"]), raw_data=block, orig=block)
+                table_node = Table(bbox=tuple(block["bbox"]), raw_data=block)
                 page_node.add_child(table_node)
 
 
-        self._detect_page_number(page_node)
+        if "page_numbers" in self.features:
+            self._detect_page_number(page_node)
 
         self._merge_paragraphs(page_node)
 
+        if "spatial" in self.features:
+            page_node.index = build_page_index(page_node)
+
+    def _extract_blocks(self, page) -> List[dict]:
+        """
+        Блоки страницы в порядке get_text("dict"), но без данных изображений:
+        текстовые блоки извлекаются с TEXT_FLAGS, блоки изображений собираются
+        из метаданных get_image_info() и ставятся на свои места по номеру блока.
+        """
+        text_blocks = page.get_text("dict", flags=TEXT_FLAGS)["blocks"]
+        if "images" not in self.features:
+            return text_blocks
+        images = sorted(page.get_image_info(hashes=False, xrefs=False), key=lambda i: i["number"])
+        if not images:
+            return text_blocks
+
+        blocks = []
+        text_iter = iter(text_blocks)
+        for image in images:
+            while len(blocks) < image["number"]:
+                block = next(text_iter, None)
+                if block is None:
+                    break
+                blocks.append(block)
+            blocks.append({"type": 1, "number": image["number"], "bbox": image["bbox"]})
+        blocks.extend(text_iter)
+        return blocks
 
     def sort_blocks_by_y(self, blocks):
         blocks_with_bbox = [b for b in blocks if b.get("bbox")]
@@ -113,8 +314,8 @@ class PDFDOMParser:
         page_node.children = merged_children
 
 
-    def _parse_text_block(self, block, link_rects) -> Optional[Paragraph]:
-        para = Paragraph(orig=block)
+    def _parse_text_block(self, block, link_index: GridIndex) -> Optional[Paragraph]:
+        para = Paragraph()
 
         all_spans = []
         for line in block.get("lines", []):
@@ -135,7 +336,7 @@ class PDFDOMParser:
         while i < n:
             first_span = all_spans[i]
             y_center = (first_span["bbox"][1] + first_span["bbox"][3]) / 2
-            line_node = Line(bbox=None, orig=None)
+            line_node = Line(bbox=None)
             para.add_child(line_node)
 
             while i < n:
@@ -144,20 +345,22 @@ class PDFDOMParser:
                 if abs(span_y_center - y_center) > y_threshold:
                     break
 
-                span_rect = fitz.Rect(span["bbox"])
                 link_node = None
-                for lrect, uri in link_rects:
-                    if span_rect.intersects(lrect):
-                        link_node = Link(uri=uri, bbox=tuple(lrect))
-                        line_node.add_child(link_node)
-                        break
+                hits = link_index.intersecting(span["bbox"])
+                if hits:
+                    lrect, uri = hits[0]
+                    link_node = Link(uri=uri, bbox=lrect)
+                    line_node.add_child(link_node)
 
+                font = sys.intern(span.get("font", ""))
                 span_node = Span(
                     text=span.get("text", ""),
-                    font=span.get("font", ""),
+                    font=font,
+                    real_font=sys.intern(font.replace(" ", "")),
                     size=span.get("size", 0.0),
                     bbox=tuple(span["bbox"]),
-                    orig=span
+                    color=span.get("color"),
+                    flags=span.get("flags", 0),
                 )
 
                 if link_node:
@@ -187,10 +390,7 @@ class PDFDOMParser:
         if block.get("type") != 1:
             return None
 
-        return ImageObject(
-            bbox=tuple(block["bbox"]),
-            orig=block
-        )
+        return ImageObject(bbox=tuple(block["bbox"]))
 
 
 
@@ -202,8 +402,7 @@ class PDFDOMParser:
                 if text.isdigit():
                     page_number_node = PageNumber(
                         text=text,
-                        bbox=node.bbox,
-                        orig=node.orig
+                        bbox=node.bbox
                     )
                     page_node.replace_child(node, page_number_node)
                     break
@@ -1,7 +1,10 @@
-from parser_dom import PDFDOMParser
-from renderer import render_errors
+import json
+from typing import Iterator
+import config
+from session import PDFSession
 from errors import RuleError
 from dom import Document
+from parser_dom import PDFDOMParser
 
 from rules.font import RuleFontSize
 from rules.structure import RuleHeadingFollowedByParagraph
@@ -10,28 +13,222 @@ from rules.image import RuleImageCenterByMargins
 from rules.rule_line_spacing import RuleLineSpacing
 from rules.paragraph_indent import RuleParagraphIndent
 from rules.rule_table_layout import RuleTableLayout
+from rules.engine import RuleEngine
+
+def process_pdf(source, draw_lines=False, progress=None, output_path: str = None, rule_names=None):
+    """
+    Проверка и отрисовка ошибок. source — байты PDF или путь к файлу.
+    Результат — байты PDF или, если задан output_path, путь к записанному файлу.
+    progress(done, total) — необязательный отчёт о числе разобранных страниц.
+    rule_names — проверяемые правила (см. select_rules), None — все.
+    """
+    with open_session(source, rule_names) as session:
+        errors: list[RuleError] = validate_document(session.parse(progress=progress), rule_names)
+        return session.render(errors, draw_lines=draw_lines, output_path=output_path)
+
+def process_pdf_report(source, draw_lines=False) -> tuple[bytes, bytes]:
+    """Исправленный PDF и JSON-отчёт (как у validate_pdf_json) за один разбор"""
+    with PDFSession(source) as session:
+        document = session.parse()
+        errors: list[RuleError] = validate_document(document)
+        report = _report_json(len(document.pages), [err.to_dict() for err in errors])
+        return session.render(errors, draw_lines=draw_lines), report
+
+def validate_pdf(source, rule_names=None) -> list[RuleError]:
+    with open_session(source, rule_names) as session:
+        return validate_document(session.parse(), rule_names)
+
+def validate_pdf_json(source, progress=None, rule_names=None) -> bytes:
+    """
+    Результат проверки в виде компактного JSON, без отрисовки PDF.
+    Большие документы (от STREAM_MIN_PAGES страниц) проверяются постранично
+    с ограниченной памятью; порядок ошибок при этом тот же.
+    """
+    with open_session(source, rule_names) as session:
+        page_count = session.pdf.page_count
+        if page_count >= config.STREAM_MIN_PAGES:
+            rules = make_rules(rule_names)
+            buckets: list[list[dict]] = [[] for _ in rules]
+            for page_number, grouped in iter_page_reports(session, rules):
+                _extend_buckets(buckets, grouped)
+                if progress is not None and page_number is not None:
+                    progress(page_number + 1, page_count)
+            errors = [err for bucket in buckets for err in bucket]
+        else:
+            errors = [err.to_dict() for err in validate_document(session.parse(progress=progress), rule_names)]
+    return _report_json(page_count, errors)
+
+def validate_pdf_incremental(source, cached_pages: list[bytes | None],
+                             rule_names=None) -> tuple[bytes, dict[int, bytes]]:
+    """
+    Проверка с повторным использованием результатов неизменённых страниц.
+    cached_pages[i] — сохранённый ранее результат страницы i (или None).
+    Разбираются и проверяются только страницы без результата, правила уровня
+    документа запускаются заново по сводкам всех страниц.
+    Возвращает JSON как у validate_pdf_json и новые результаты страниц по номерам.
+    """
+    checker = PageChecker(make_rules(rule_names))
+    buckets: list[list[dict]] = [[] for _ in checker.rules]
+    summaries = []
+    fresh: dict[int, bytes] = {}
+
+    with open_session(source, rule_names) as session:
+        page_count = session.pdf.page_count
+        for index in range(page_count):
+            cached = _load_page_result(cached_pages[index] if index < len(cached_pages) else None)
+            if cached is not None:
+                grouped, page_summaries = cached
+            else:
+                page = session.parse_page(index)
+                grouped, page_summaries = checker.check_page(page)
+                page.orig = None
+                fresh[index] = json.dumps([grouped, page_summaries], ensure_ascii=False,
+                                          separators=(",", ":")).encode()
+            _extend_buckets(buckets, grouped)
+            summaries.append(page_summaries)
+
+    _extend_buckets(buckets, checker.check_document(summaries))
+    return _report_json(page_count, [err for bucket in buckets for err in bucket]), fresh
+
+def _load_page_result(cached: bytes | None):
+    """
+    Сохранённый результат страницы — JSON, а не pickle: кэш может лежать
+    в общем каталоге. Нечитаемая запись считается отсутствующей.
+    """
+    if cached is None:
+        return None
+    try:
+        grouped, page_summaries = json.loads(cached)
+    except (ValueError, TypeError):
+        return None
+    return grouped, page_summaries
+
+def page_fingerprints(source) -> list[str]:
+    with PDFSession(source) as session:
+        return session.page_fingerprints()
+
+def iter_page_reports(session: PDFSession, rules: list) -> Iterator[tuple[int | None, list[list[dict]]]]:
+    """
+    Проверка с ограниченной памятью. Страница разбирается, проверяется правилами
+    scope="page", её ошибки сворачиваются в словари, и страница освобождается
+    до разбора следующей. Правила scope="document" получают только сводки страниц.
+
+    Отдаёт (номер страницы, ошибки по правилам), последним — (None, ошибки уровня
+    документа). Ошибки по правилам — список той же длины и порядка, что rules.
+    """
+    checker = PageChecker(rules)
+    summaries = []
+
+    for page in session.iter_pages(keep_pages=False):
+        grouped, page_summaries = checker.check_page(page)
+        summaries.append(page_summaries)
+        yield page.number, grouped
+
+    yield None, checker.check_document(summaries)
+
+class PageChecker:
+    """
+    Проверка документа по страницам. Результат страницы — ошибки правил
+    scope="page" в виде словарей и сводки для правил scope="document";
+    он не ссылается на дерево и может сохраняться между запросами.
+    """
+
+    def __init__(self, rules: list):
+        self.rules = rules
+        self.document_rules = [r for r in rules if r.scope == "document"]
+        self.page_engine = RuleEngine([r for r in rules if r.scope == "page"])
+
+    def check_page(self, page) -> tuple[list[list[dict]], list]:
+        found = iter(self.page_engine.run_grouped(page))
+        grouped = [
+            [err.to_dict() for err in next(found)] if rule.scope == "page" else []
+            for rule in self.rules
+        ]
+        return grouped, [rule.summarize(page) for rule in self.document_rules]
+
+    def check_document(self, summaries: list[list]) -> list[list[dict]]:
+        """summaries — сводки страниц в порядке страниц, как их вернул check_page"""
+        found = iter([
+            rule.check_summaries([page_summaries[i] for page_summaries in summaries])
+            for i, rule in enumerate(self.document_rules)
+        ])
+        return [
+            [err.to_dict() for err in next(found)] if rule.scope == "document" else []
+            for rule in self.rules
+        ]
+
+def _extend_buckets(buckets: list[list[dict]], grouped: list[list[dict]]):
+    for bucket, found in zip(buckets, grouped):
+        bucket.extend(found)
+
+def _report_json(page_count: int, errors: list[dict]) -> bytes:
+    report = {"page_count": page_count, "errors": errors}
+    return json.dumps(report, ensure_ascii=False, separators=(",", ":")).encode()
+
+def stream_validate_pdf(source, rule_names=None) -> Iterator[dict]:
+    """
+    Потоковая проверка: событие "page" с ошибками страницы отдаётся сразу
+    после её разбора, ошибки уровня документа — событием "document" в конце.
+    Страницы не накапливаются, память не растёт с числом страниц.
+    """
+    error_count = 0
+
+    with open_session(source, rule_names) as session:
+        yield {"event": "start", "page_count": session.pdf.page_count}
+
+        for page_number, grouped in iter_page_reports(session, make_rules(rule_names)):
+            errors = [err for found in grouped for err in found]
+            error_count += len(errors)
+            if page_number is None:
+                yield {"event": "document", "errors": errors}
+            else:
+                yield {"event": "page", "page": page_number, "errors": errors}
+
+    yield {"event": "end", "error_count": error_count}
 
-def process_pdf(input_bytes: bytes, draw_lines=False) -> bytes:
-    errors: list[RuleError] = validate_pdf(input_bytes)
+# Правила по именам (Rule.name), в порядке проверки
+RULES = {
+    rule.name: rule
+    for rule in (
+        RuleFontSize,
+        RuleHeadingFollowedByParagraph,
+        RulePageMargins,
+        RuleImageCenterByMargins,
+        RuleLineSpacing,
+        RuleParagraphIndent,
+        RuleTableLayout,
+    )
+}
 
-    return render_errors(input_bytes, errors, draw_lines=draw_lines)
+def make_rules(rule_names=None) -> list:
+    return [RULES[name]() for name in (rule_names or RULES)]
 
-def validate_pdf(input_bytes: bytes) -> list[RuleError]:
-    parser = PDFDOMParser()
-    document: Document = parser.parse_bytes(input_bytes)
+def select_rules(spec: str | None) -> tuple[str, ...] | None:
+    """
+    Разбор выбора правил из запроса: имена через запятую.
+    Результат — имена в порядке RULES без повторов или None, если выбраны
+    все правила (тогда результат не отличается от проверки без выбора).
+    """
+    if spec is None:
+        return None
+    names = {name.strip() for name in spec.split(",") if name.strip()}
+    if not names:
+        raise ValueError(f"Не выбрано ни одного правила (доступны {', '.join(RULES)})")
+    unknown = names - RULES.keys()
+    if unknown:
+        raise ValueError(f"Неизвестные правила: {', '.join(sorted(unknown))} (доступны {', '.join(RULES)})")
+    selected = tuple(name for name in RULES if name in names)
+    return None if len(selected) == len(RULES) else selected
 
-    rules = [
-        RuleFontSize(),
-        RuleHeadingFollowedByParagraph(),
-        RulePageMargins(),
-        RuleImageCenterByMargins(),
-        RuleLineSpacing(),
-        RuleParagraphIndent(),
-        RuleTableLayout(),
-    ]
+def required_features(rules: list) -> frozenset:
+    """Что нужно извлечь при разборе для проверки правилами rules"""
+    return frozenset().union(*(rule.requires for rule in rules))
 
-    errors: list[RuleError] = []
-    for r in rules:
-        errors.extend(r.check(document))
+def open_session(source, rule_names=None) -> PDFSession:
+    """Сессия, разбор в которой ограничен тем, что нужно выбранным правилам"""
+    if rule_names is None:
+        return PDFSession(source)
+    return PDFSession(source, PDFDOMParser(features=required_features(make_rules(rule_names))))
 
-    return errors
+def validate_document(document: Document, rule_names=None) -> list[RuleError]:
+    return RuleEngine(make_rules(rule_names)).run(document)
@@ -0,0 +1,149 @@
+"""
+Профилирование отдельных запросов: время этапов (для заголовка Server-Timing)
+и выборочный профиль стеков вызовов.
+
+Профилируемая функция выполняется в обработчике через profiled(): рядом
+работает поток, который раз в PROFILE_INTERVAL_MS снимает стек вызовов
+обработки. Стеки сохраняются в формате «свёрнутых» строк (collapsed stacks):
+«модуль:функция;…;модуль:функция число_снимков» — его читают flamegraph.pl,
+speedscope и другие просмотрщики. Длинные вызовы MuPDF, не отпускающие GIL,
+попадают в профиль вызывающей их Python-функцией.
+"""
+import os
+import sys
+import threading
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import config
+import metrics
+
+# Этапы Server-Timing → гистограммы метрик, из которых берётся их время
+STAGES = (
+    ("open", metrics.OPEN_SECONDS),
+    ("parse", metrics.PARSE_SECONDS),
+    ("rule", metrics.RULE_SECONDS),
+    ("render", metrics.RENDER_SECONDS),
+)
+
+
+@dataclass
+class Profile:
+    """Результат профилирования: время этапов (мс) и свёрнутые стеки"""
+    timings: Dict[str, float] = field(default_factory=dict)
+    stacks: Dict[str, int] = field(default_factory=dict)
+    samples: int = 0
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+class StackSampler:
+    """
+    Фоновый поток, раз в interval секунд снимающий стек потока thread_id.
+    Кадры от root и выше (запуск обработчика) в стек не входят.
+    """
+
+    def __init__(self, thread_id: int, interval: float, root=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root = root
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            outer = None
+            while frame is not None and frame.f_code is not self.root:
+                outer = frame.f_code
+                names.append(f"{os.path.basename(outer.co_filename)}:{outer.co_name}")
+                frame = frame.f_back
+            # снимок до или после профилируемого вызова (вход в with, выход из него)
+            if outer is None or outer in (StackSampler.__enter__.__code__, StackSampler.__exit__.__code__):
+                continue
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+
+def _stage_sums(state: Dict[str, dict]) -> Dict[str, float]:
+    """Суммарное время этапов из export() метрик, секунд"""
+    sums: Dict[str, float] = {}
+    for stage, histogram in STAGES:
+        for labels, values in state.get(histogram.name, {}).items():
+            name = f"{stage}.{labels[0]}" if labels else stage
+            sums[name] = sums.get(name, 0.0) + values[-2]
+    return sums
+
+
+def profiled(fn, *args, interval_ms: int = config.PROFILE_INTERVAL_MS):
+    """
+    Выполняет fn(*args) с профилированием; возвращает (результат, Profile).
+    Время этапов — разница метрик до и после вызова, поэтому при проверках
+    в потоках (EXECUTOR_MODE=thread) в него попадают и параллельные запросы.
+    """
+    before = _stage_sums(metrics.export())
+    with StackSampler(threading.get_ident(), interval_ms / 1000, root=sys._getframe().f_code) as sampler:
+        result = fn(*args)
+    after = _stage_sums(metrics.export())
+
+    timings = {
+        name: round((seconds - before.get(name, 0.0)) * 1000, 3)
+        for name, seconds in after.items()
+        if seconds - before.get(name, 0.0) > 0
+    }
+    return result, Profile(timings=timings, stacks=dict(sampler.stacks), samples=sampler.samples)
+
+
+def server_timing(profile: Profile, total_ms: Optional[float] = None) -> str:
+    """Значение заголовка Server-Timing"""
+    entries = [f"{name};dur={ms:.3f}" for name, ms in profile.timings.items()]
+    if total_ms is not None:
+        entries.append(f"total;dur={total_ms:.3f}")
+    return ", ".join(entries)
+
+
+def save_profile(profile: Profile) -> str:
+    """Сохраняет стеки в PROFILE_DIR; возвращает идентификатор профиля"""
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    with open(os.path.join(config.PROFILE_DIR, f"{profile_id}.folded"), "w", encoding="utf-8") as f:
+        f.write(profile.folded())
+    _evict()
+    return profile_id
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """Путь к сохранённому профилю или None"""
+    if len(profile_id) != 32 or any(c not in "0123456789abcdef" for c in profile_id):
+        return None
+    path = os.path.join(config.PROFILE_DIR, f"{profile_id}.folded")
+    return path if os.path.exists(path) else None
+
+
+def _evict():
+    entries = sorted(
+        (entry.stat().st_mtime, entry.path)
+        for entry in os.scandir(config.PROFILE_DIR)
+        if entry.name.endswith(".folded")
+    )
+    for _, path in entries[:max(0, len(entries) - config.PROFILE_KEEP)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -1,23 +1,98 @@
+import os
+import shutil
+import tempfile
+
 import fitz
+import config
+import metrics
 from errors import RuleError
+from dom import page_of
+from parser_dom import open_pdf
 
 CM_TO_PT = 28.35
 
-def render_errors(input_bytes: bytes, errors: list[RuleError], draw_lines=False) -> bytes:
-    doc = fitz.open(stream=input_bytes, filetype="pdf")
+def render_errors(source, errors: list[RuleError], draw_lines=False, output_path: str = None,
+                  mode: str = None):
+    """
+    Добавляет в PDF комментарии с ошибками и возвращает байты результата,
+    а если задан output_path — сохраняет результат в файл и возвращает путь.
+    source — байты PDF, путь к файлу или уже открытый fitz.Document.
+
+    mode (по умолчанию RENDER_MODE): "full" — документ переписывается целиком,
+    "incremental" — комментарии дописываются в конец копии исходного файла
+    инкрементальным обновлением, исходные байты не меняются. Если документ
+    нельзя сохранить инкрементально (например, он восстанавливался при
+    открытии), он переписывается целиком.
+    """
+    with metrics.RENDER_SECONDS.time():
+        if isinstance(source, fitz.Document):
+            return _render(source, errors, draw_lines, output_path, mode)
+
+        doc = open_pdf(source)
+        try:
+            return _render(doc, errors, draw_lines, output_path, mode)
+        finally:
+            doc.close()
+
+
+def _render(doc: fitz.Document, errors: list[RuleError], draw_lines: bool, output_path: str = None,
+            mode: str = None):
+    if (mode or config.RENDER_MODE) == "incremental" and doc.can_save_incrementally():
+        return _render_incremental(doc, errors, draw_lines, output_path)
+
+    _annotate(doc, errors, draw_lines)
+    if output_path is not None:
+        doc.save(output_path)
+        return output_path
+    return doc.write()
+
 
+def _render_incremental(doc: fitz.Document, errors: list[RuleError], draw_lines: bool,
+                        output_path: str = None):
+    """
+    Инкрементальное сохранение возможно только в файл, из которого открыт
+    документ, поэтому исходник копируется в output_path (или во временный
+    файл), комментарии добавляются в открытую копию и дописываются в её конец
+    """
+    if output_path is None:
+        fd, target = tempfile.mkstemp(suffix=".pdf", dir=config.SPOOL_DIR or None)
+        os.close(fd)
+    else:
+        target = output_path
+
+    try:
+        if doc.stream is not None:
+            with open(target, "wb") as f:
+                f.write(doc.stream)
+        else:
+            shutil.copyfile(doc.name, target)
+
+        with fitz.open(target) as copy:
+            _annotate(copy, errors, draw_lines)
+            copy.saveIncr()
+
+        if output_path is not None:
+            return output_path
+        with open(target, "rb") as f:
+            return f.read()
+    finally:
+        if output_path is None:
+            os.remove(target)
+
+
+def _annotate(doc: fitz.Document, errors: list[RuleError], draw_lines: bool):
     grouped = {}
     for err in errors:
         grouped.setdefault(err.node_id, []).append(err)
 
     for errs in grouped.values():
         node = errs[0].node
-        page_node = node
-        while page_node and not hasattr(page_node, "number"):
-            page_node = page_node.parent
+        page_node = page_of(node)
         if page_node is None:
             continue
-        page = doc[page_node.number]
+        page = page_node.orig
+        if page is None or page.parent is not doc:
+            page = doc[page_node.number]
 
         if hasattr(node, "bbox") and node.bbox != (0,0,0,0):
             rect = fitz.Rect(*node.bbox)
@@ -26,5 +101,3 @@ def render_errors(input_bytes: bytes, errors: list[RuleError], draw_lines=False)
 
             if draw_lines:
                 page.draw_rect(rect, color=(1,0,0), width=1)
-
-    return doc.write()
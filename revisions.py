@@ -0,0 +1,93 @@
+import asyncio
+import json
+from collections import Counter
+from typing import Optional
+
+from cache import cache_key, result_cache
+from executor import executor
+from processor import page_fingerprints, validate_pdf_incremental
+from uploads import SpooledUpload
+
+
+def page_key(fingerprint: str, page_index: int, rule_names=None) -> str:
+    """
+    Ключ сохранённого результата страницы. Номер страницы входит в ключ:
+    проверка номера страницы зависит от её положения в документе.
+    Результат проверки частью правил хранится отдельно от полного.
+    """
+    return cache_key(fingerprint.encode(), "page", page_index, *rules_key_parts(rule_names))
+
+
+def rules_key_parts(rule_names=None) -> tuple:
+    """Части ключа кэша для выбора правил; без выбора ключи не меняются"""
+    return (f"rules={','.join(rule_names)}",) if rule_names else ()
+
+
+def revision_key(revision: str) -> str:
+    return cache_key(revision.encode(), "revision")
+
+
+async def validate_revision(upload: SpooledUpload, previous: Optional[str] = None,
+                            rule_names=None) -> bytes:
+    """
+    Проверка очередной версии документа. Страницы с уже известным отпечатком
+    не разбираются заново — берутся их сохранённые результаты.
+
+    В отчёт добавляется revision — идентификатор этой версии. Если передан
+    previous (revision одной из прошлых проверок), отчёт дополняется сравнением
+    с ней: изменённые страницы, новые и исправленные нарушения. Если прошлая
+    версия уже вытеснена из хранилища, previous в отчёте — null.
+    rule_names — проверяемые правила; revision зависит и от них.
+    """
+    revision = upload.key("revision", *rules_key_parts(rule_names))
+    fingerprints = await executor.run(page_fingerprints, upload.path)
+
+    keys = [page_key(fp, i, rule_names) for i, fp in enumerate(fingerprints)]
+    cached = await asyncio.to_thread(lambda: [result_cache.get(key) for key in keys])
+
+    report_bytes, fresh = await executor.run(validate_pdf_incremental, upload.path, cached, rule_names)
+    report = json.loads(report_bytes)
+
+    record = json.dumps({"fingerprints": fingerprints, "errors": report["errors"]}).encode()
+
+    def store():
+        for index, value in fresh.items():
+            result_cache.put(keys[index], value)
+        result_cache.put(revision_key(revision), record)
+    await asyncio.to_thread(store)
+
+    report["revision"] = revision
+    report["reused_pages"] = len(fingerprints) - len(fresh)
+    if previous:
+        previous_record = await asyncio.to_thread(result_cache.get, revision_key(previous))
+        report["previous"] = (
+            compare_revisions(previous, json.loads(previous_record), fingerprints, report["errors"])
+            if previous_record is not None else None
+        )
+
+    return json.dumps(report, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def compare_revisions(revision: str, previous: dict, fingerprints: list[str], errors: list[dict]) -> dict:
+    """
+    Сравнение с прошлой версией: номера изменённых (и добавленных) страниц,
+    нарушения, которых не было раньше, и нарушения, которые исчезли.
+    """
+    old_fingerprints = previous["fingerprints"]
+    changed_pages = [
+        i for i, fp in enumerate(fingerprints)
+        if i >= len(old_fingerprints) or old_fingerprints[i] != fp
+    ]
+
+    def counted(items):
+        return Counter(json.dumps(item, sort_keys=True, ensure_ascii=False) for item in items)
+
+    current = counted(errors)
+    old = counted(previous["errors"])
+    return {
+        "revision": revision,
+        "page_count": len(old_fingerprints),
+        "changed_pages": changed_pages,
+        "new": [json.loads(item) for item in (current - old).elements()],
+        "fixed": [json.loads(item) for item in (old - current).elements()],
+    }
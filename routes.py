@@ -1,12 +1,39 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import StreamingResponse
-import io
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse, JSONResponse, FileResponse
+from starlette.background import BackgroundTask
+from contextlib import contextmanager
+import asyncio
+import functools
+import hmac
+import json
+import time
 import urllib.parse
-from processor import process_pdf
+import config
+import profiling
+from processor import process_pdf, select_rules, stream_validate_pdf, validate_pdf_json
+from revisions import rules_key_parts, validate_revision
+from batch import close_items, collect_items, run_batch, TooManyFilesError
+from jobs import get_store, get_runner, KINDS, DONE
+from executor import executor, QueueFullError
+from cache import render_key_parts, result_cache
+from uploads import SpooledUpload, UploadTooLargeError, spool_upload
+import metrics
 
 router = APIRouter()
 
 
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
 @router.post(
     "/upload",
     summary="Загрузка PDF и получение обработанного файла",
@@ -19,11 +46,330 @@ router = APIRouter()
 - Файл должен быть формата PDF
 - MIME-типы: `application/pdf` или `application/x-pdf`
 - Неверный формат - 400
+- Файл больше допустимого размера - 413
+- Очередь проверок заполнена - 503
+
+Ответ содержит `ETag`: хэш файла и версии правил. Повторная отправка того же
+файла с заголовком `If-None-Match` возвращает 304 без повторной проверки.
+
+`rules` — проверить только часть правил: имена через запятую (`font`,
+`structure`, `margins`, `images`, `line_spacing`, `indent`, `tables`).
+Из документа тогда извлекается только то, что нужно этим правилам, — проверка
+быстрее. Нарушения те же, что у этих правил при полной проверке.
+Неизвестное имя - 400.
+
+`profile=1` — проверка с профилированием (только с заголовком `X-Profile-Token`
+или если профилирование включено в настройках, иначе 403): без кэша, ответ
+дополняется заголовками `Server-Timing` (время открытия, разбора, каждого
+правила и отрисовки) и `X-Profile` — адресом профиля стеков вызовов.
+"""
+)
+async def download_pdf(request: Request, file: UploadFile = File(...), profile: bool = False,
+                       rules: str | None = None):
+    rule_names = read_rules(rules)
+    if profile:
+        check_profile_access(request)
+    upload = await read_pdf_upload(file)
+    try:
+        key = upload.key("render", *render_key_parts(), *rules_key_parts(rule_names))
+        etag = f'"{key}"'
+
+        if not profile and etag_matches(request.headers.get("if-none-match"), etag):
+            upload.close()
+            return Response(status_code=304, headers={"ETag": etag})
+
+        encoded_name = urllib.parse.quote(f"processed_{file.filename}")
+        headers = {
+            "Content-Disposition": (
+                f"attachment; filename=processed.pdf; "
+                f"filename*=UTF-8''{encoded_name}"
+            ),
+            "ETag": etag,
+        }
+
+        render = functools.partial(process_pdf, output_path=upload.output_path(), rule_names=rule_names)
+        if profile:
+            output_path, profile_headers = await run_profiled(render, upload.path)
+            headers.update(profile_headers)
+            return FileResponse(output_path, media_type="application/pdf", headers=headers,
+                                background=BackgroundTask(upload.close))
+
+        processed = await asyncio.to_thread(result_cache.get, key)
+        if processed is not None:
+            upload.close()
+            return Response(content=processed, media_type="application/pdf", headers=headers)
+
+        # результат пишется обработчиком в файл и отдаётся с диска;
+        # в кэш он попадает уже после отправки ответа
+        with processing_errors():
+            output_path = await executor.run(render, upload.path)
+    except BaseException:
+        upload.close()
+        raise
+
+    return FileResponse(
+        output_path,
+        media_type="application/pdf",
+        headers=headers,
+        background=BackgroundTask(_cache_file_and_close, key, output_path, upload),
+    )
+
+
+def _cache_file_and_close(key: str, path: str, upload: SpooledUpload):
+    try:
+        with open(path, "rb") as f:
+            result_cache.put(key, f.read())
+    finally:
+        upload.close()
+
+
+@router.post(
+    "/validate",
+    summary="Проверка PDF с результатом в JSON",
+    description="""
+Загружает PDF-документ и возвращает список найденных нарушений оформления
+в JSON, без формирования исправленного PDF.
+
+Каждое нарушение содержит номер страницы (с нуля), `bbox` элемента,
+тип ошибки, сообщение и, если есть, ожидаемое/найденное значение.
+
+Ответ содержит `revision` — идентификатор этой версии документа. Страницы,
+не изменившиеся с прошлых проверок, повторно не разбираются (`reused_pages` —
+сколько таких страниц). Если передать `previous` — `revision` прошлой версии,
+ответ дополняется полем `previous`: изменённые страницы (`changed_pages`),
+новые (`new`) и исправленные (`fixed`) нарушения. Если прошлая версия уже
+неизвестна серверу, `previous` равно `null`.
+
+Коды ответов, `ETag`, `rules` и `profile=1` — как у `/upload`. При профилировании
+документ проверяется целиком, без сохранённых результатов страниц,
+и ответ не содержит `revision` и `previous`.
 """
 )
-async def download_pdf(file: UploadFile = File(...)):
+async def validate_pdf_route(request: Request, file: UploadFile = File(...), previous: str | None = None,
+                             profile: bool = False, rules: str | None = None):
+    rule_names = read_rules(rules)
+    if profile:
+        check_profile_access(request)
+    upload = await read_pdf_upload(file)
+    try:
+        if profile:
+            validate = functools.partial(validate_pdf_json, rule_names=rule_names)
+            report, headers = await run_profiled(validate, upload.path)
+            return Response(content=report, media_type="application/json", headers=headers)
+
+        key = upload.key("json", previous or "", *rules_key_parts(rule_names))
+        etag = f'"{key}"'
+
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        report = await run_cached(key, lambda: validate_revision(upload, previous, rule_names))
+    finally:
+        upload.close()
 
+    return Response(content=report, media_type="application/json", headers={"ETag": etag})
 
+
+@router.post(
+    "/validate/stream",
+    summary="Потоковая проверка PDF",
+    description="""
+Загружает PDF-документ и отдаёт результаты проверки по мере готовности:
+ошибки каждой страницы приходят сразу после её разбора и проверки,
+ошибки уровня документа (структура заголовков) — в конце.
+
+Формат — NDJSON (по событию в строке). При `Accept: text/event-stream`
+события отдаются как Server-Sent Events.
+
+События: `start` (`page_count`), `page` (`page`, `errors`),
+`document` (`errors`), `end` (`error_count`), `error` (`detail`).
+
+`rules` — как у `/upload`.
+"""
+)
+async def validate_pdf_stream(request: Request, file: UploadFile = File(...), rules: str | None = None):
+    rule_names = read_rules(rules)
+    upload = await read_pdf_upload(file)
+
+    # первое событие запрашивается до ответа: при заполненной очереди — 503
+    stream = executor.stream(stream_validate_pdf, upload.path, rule_names)
+    try:
+        first = [await anext(stream)]
+    except QueueFullError:
+        upload.close()
+        raise HTTPException(
+            status_code=503,
+            detail="Сервер перегружен, повторите попытку позже"
+        )
+    except Exception as e:
+        first = [{"event": "error", "detail": f"Ошибка обработки PDF: {e}"}]
+
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    def encode(event: dict) -> bytes:
+        data = json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+        if sse:
+            return f"event: {event['event']}\ndata: {data}\n\n".encode()
+        return (data + "\n").encode()
+
+    async def events():
+        try:
+            for event in first:
+                yield encode(event)
+            async for event in stream:
+                yield encode(event)
+        except Exception as e:
+            yield encode({"event": "error", "detail": f"Ошибка обработки PDF: {e}"})
+        finally:
+            await finish()
+
+    async def finish():
+        await stream.aclose()
+        upload.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(finish),
+    )
+
+
+@router.post(
+    "/batch",
+    summary="Пакетная проверка PDF",
+    description="""
+Принимает несколько PDF-файлов и/или ZIP-архивов с PDF (поле `files`),
+проверяет их параллельно и возвращает ZIP-архив:
+
+- `processed/<имя>.pdf` — исправленные PDF, по мере готовности
+- `summary.json` — сводка по всем файлам: статус, число страниц,
+  список нарушений или причина ошибки
+
+Ошибка в одном файле не прерывает пакет — файл попадает в сводку
+со статусом `error`.
+
+PDF больше допустимого размера (в том числе в архиве) попадает в сводку
+со статусом `error`.
+
+- Ни одного файла - 400
+- Слишком много файлов или пакет больше допустимого размера - 413
+- Очередь проверок заполнена - 503
+"""
+)
+async def batch_route(files: list[UploadFile] = File(...)):
+    try:
+        items = await collect_items(files)
+    except (TooManyFilesError, UploadTooLargeError) as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    if not items:
+        raise HTTPException(
+            status_code=400,
+            detail="Не передано ни одного PDF файла"
+        )
+
+    if executor.is_full():
+        close_items(items)
+        raise HTTPException(
+            status_code=503,
+            detail="Сервер перегружен, повторите попытку позже"
+        )
+
+    return StreamingResponse(
+        run_batch(items),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=checked.zip"},
+        background=BackgroundTask(close_items, items),
+    )
+
+
+@router.post(
+    "/jobs",
+    status_code=202,
+    summary="Постановка проверки PDF в очередь",
+    description="""
+Принимает PDF и сразу возвращает идентификатор задачи, не дожидаясь проверки.
+Подходит для больших документов, проверка которых дольше таймаутов прокси.
+
+`kind`: `render` — результат исправленный PDF (как `/upload`),
+`json` — список нарушений (как `/validate`).
+
+Состояние и прогресс (страницы) — `GET /jobs/{id}`,
+результат — `GET /jobs/{id}/result`. Результат хранится ограниченное время.
+"""
+)
+async def create_job(file: UploadFile = File(...), kind: str = "render"):
+    if kind not in KINDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестный вид задачи: {kind} (ожидается {', '.join(KINDS)})"
+        )
+
+    upload = await read_pdf_upload(file)
+    store = get_store()
+
+    _, _, cache_kind = KINDS[kind]
+    key_parts = render_key_parts() if cache_kind == "render" else ()
+    try:
+        cached = await asyncio.to_thread(result_cache.get, upload.key(cache_kind, *key_parts))
+        if cached is not None:
+            job_id = await asyncio.to_thread(store.submit_done, kind, file.filename, cached)
+        else:
+            # задача может выполняться в другом процессе или на другой машине,
+            # поэтому вход хранится в самой базе
+            file_bytes = await asyncio.to_thread(upload.read_bytes)
+            job_id = await asyncio.to_thread(store.submit, kind, file.filename, file_bytes)
+            get_runner().notify()
+    finally:
+        upload.close()
+
+    job = await asyncio.to_thread(store.get, job_id)
+    return JSONResponse(job, status_code=202, headers={"Location": f"/jobs/{job_id}"})
+
+
+@router.get("/jobs/{job_id}", summary="Состояние задачи проверки")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(get_store().get, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Задача не найдена или срок хранения результата истёк"
+        )
+    return job
+
+
+@router.get("/jobs/{job_id}/result", summary="Результат задачи проверки")
+async def get_job_result(job_id: str):
+    store = get_store()
+    job = await asyncio.to_thread(store.get, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Задача не найдена или срок хранения результата истёк"
+        )
+    if job["status"] != DONE:
+        raise HTTPException(
+            status_code=409,
+            detail=job["error"] or "Задача ещё не выполнена"
+        )
+
+    result = await asyncio.to_thread(store.result, job_id)
+    _, media_type, _ = KINDS[job["kind"]]
+    headers = {}
+    if job["kind"] == "render":
+        encoded_name = urllib.parse.quote(f"processed_{job['filename']}")
+        headers["Content-Disposition"] = (
+            f"attachment; filename=processed.pdf; filename*=UTF-8''{encoded_name}"
+        )
+    return Response(content=result, media_type=media_type, headers=headers)
+
+
+async def read_pdf_upload(file: UploadFile) -> SpooledUpload:
+    """
+    Проверяет загрузку и переписывает её во временный файл (не больше
+    MAX_UPLOAD_BYTES). Файл удаляет вызывающий — SpooledUpload.close().
+    """
     if file.content_type not in ("application/pdf", "application/x-pdf"):
         raise HTTPException(
             status_code=400,
@@ -38,18 +384,42 @@ async def download_pdf(file: UploadFile = File(...)):
         )
 
 
-    file_bytes = await file.read()
+    try:
+        upload = await spool_upload(file, config.MAX_UPLOAD_BYTES)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
 
-    if not file_bytes.startswith(b"%PDF"):
+    if not upload.head.startswith(b"%PDF"):
+        upload.close()
         raise HTTPException(
             status_code=400,
             detail="Файл не является корректным PDF-документом"
         )
 
+    return upload
+
+
+def read_rules(spec: str | None) -> tuple[str, ...] | None:
+    """Выбор правил из параметра rules; неизвестное имя — 400"""
+    try:
+        return select_rules(spec)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
+@contextmanager
+def processing_errors():
+    """Ошибки обработки → HTTP: заполненная очередь — 503, остальное — 500"""
     try:
-        processed = process_pdf(file_bytes)
+        yield
+    except HTTPException:
+        raise
+    except QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Сервер перегружен, повторите попытку позже"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -57,16 +427,61 @@ async def download_pdf(file: UploadFile = File(...)):
         )
 
 
-    orig_name = f"processed_{file.filename}"
-    encoded_name = urllib.parse.quote(orig_name)
+async def run_cached(key: str, compute) -> bytes:
+    """Берёт результат из кэша или вычисляет его: compute() — корутина с результатом"""
+    with processing_errors():
+        result = await asyncio.to_thread(result_cache.get, key)
+        if result is None:
+            result = await compute()
+            await asyncio.to_thread(result_cache.put, key, result)
+        return result
 
-    return StreamingResponse(
-        io.BytesIO(processed),
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": (
-                f"attachment; filename=processed.pdf; "
-                f"filename*=UTF-8''{encoded_name}"
-            )
-        }
-    )
+
+def check_profile_access(request: Request):
+    if config.PROFILE_ENABLED:
+        return
+    token = request.headers.get("x-profile-token", "")
+    if not config.PROFILE_TOKEN or not hmac.compare_digest(token.encode(), config.PROFILE_TOKEN.encode()):
+        raise HTTPException(
+            status_code=403,
+            detail="Профилирование запросов не разрешено"
+        )
+
+
+async def run_profiled(fn, *args) -> tuple:
+    """fn(*args) в обработчике с профилированием: (результат, заголовки ответа)"""
+    start = time.perf_counter()
+    with processing_errors():
+        result, profile = await executor.run(profiling.profiled, fn, *args)
+    total_ms = (time.perf_counter() - start) * 1000
+
+    profile_id = await asyncio.to_thread(profiling.save_profile, profile)
+    return result, {
+        "Server-Timing": profiling.server_timing(profile, total_ms),
+        "X-Profile": f"/profiles/{profile_id}",
+    }
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    summary="Профиль стеков вызовов профилированного запроса",
+    description="""
+Профиль, сохранённый запросом с `profile=1` (адрес — в заголовке `X-Profile`
+его ответа): свёрнутые стеки вызовов, по строке на стек с числом снимков —
+формат flamegraph.pl и speedscope. Доступ — как к профилированию.
+"""
+)
+async def get_profile(request: Request, profile_id: str):
+    check_profile_access(request)
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Профиль не найден"
+        )
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=f"{profile_id}.folded")
+
+
+@router.get("/metrics", summary="Метрики в формате Prometheus", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,3 +1,4 @@
+from .engine import Rule, RuleEngine
 from .font import RuleFontSize
 from .structure import RuleHeadingFollowedByParagraph
 from .page_layout import RulePageMargins
@@ -6,4 +7,4 @@ from .rule_line_spacing import RuleLineSpacing
 from .paragraph_indent import RuleParagraphIndent
 from .rule_table_layout import RuleTableLayout
 
-__all__ = ["RuleFontSize", "RuleHeadingFollowedByParagraph", "RulePageMargins", "RuleImageCenterByMargins","RuleLineSpacing","RuleParagraphIndent","RuleTableLayout"]
+__all__ = ["Rule", "RuleEngine", "RuleFontSize", "RuleHeadingFollowedByParagraph", "RulePageMargins", "RuleImageCenterByMargins","RuleLineSpacing","RuleParagraphIndent","RuleTableLayout"]
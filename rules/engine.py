@@ -0,0 +1,125 @@
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Tuple
+from dom import Node, Document, Page
+from errors import RuleError
+from parser_dom import FEATURES
+import metrics
+
+
+class Rule:
+    """
+    Базовый класс правила.
+
+    Правило объявляет обработчики узлов методами visit_<node_type>
+    (visit_page, visit_paragraph, visit_span, visit_image, visit_table, ...).
+    Обработчик получает узел и возвращает список найденных ошибок.
+    Перед обходом вызывается begin(root).
+    RuleEngine вызывает обработчики всех правил за один обход документа.
+
+    scope = "page" — правилу достаточно одной страницы (можно проверять постранично),
+    scope = "document" — правилу нужен весь документ.
+
+    name — идентификатор для выбора правил в запросе,
+    requires — что правило использует из разбора (см. parser_dom.FEATURES);
+    по умолчанию — всё.
+    """
+
+    scope = "page"
+    name = ""
+    requires = FEATURES
+
+    def begin(self, root: Node):
+        """Вызывается перед обходом root — для подготовки данных на весь обход"""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # без сводок правило уровня документа молча ничего не нашло бы при постраничной проверке
+        if cls.scope == "document" and (cls.summarize is Rule.summarize
+                                        or cls.check_summaries is Rule.check_summaries):
+            raise TypeError(f"{cls.__name__}: правило scope=\"document\" должно определять "
+                            f"summarize и check_summaries")
+
+    def summarize(self, page: Page) -> Any:
+        """
+        Сводка страницы для правил scope = "document" в потоковом режиме:
+        страница освобождается сразу после проверки, и правило получает
+        вместо дерева только сводки всех страниц в check_summaries.
+        Сводка сохраняется в кэше результатов страниц, поэтому должна
+        сериализоваться в JSON. Правилам scope = "page" сводки не нужны.
+        """
+        return None
+
+    def check_summaries(self, summaries: List[Any]) -> List[RuleError]:
+        """Проверка документа по сводкам страниц (в порядке страниц)"""
+        return []
+
+    def check(self, document: Document) -> List[RuleError]:
+        return RuleEngine([self]).run(document)
+
+    def check_page(self, page: Page) -> List[RuleError]:
+        return RuleEngine([self]).run(page)
+
+
+Handler = Callable[[Node], List[RuleError]]
+
+
+class RuleEngine:
+    """
+    Однопроходная проверка: дерево обходится один раз, каждый узел передаётся
+    обработчикам всех правил, зарегистрированным для его node_type.
+    Ошибки возвращаются сгруппированными по правилам в порядке списка rules,
+    внутри правила — в порядке обхода.
+    """
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        self._handlers: Dict[str, List[Tuple[int, Handler]]] = {}
+        for index, rule in enumerate(rules):
+            for name in dir(rule):
+                if not name.startswith("visit_"):
+                    continue
+                handler = getattr(rule, name)
+                if callable(handler):
+                    self._handlers.setdefault(name[len("visit_"):], []).append((index, handler))
+
+    def run(self, root: Node) -> List[RuleError]:
+        errors: List[RuleError] = []
+        for bucket in self.run_grouped(root):
+            errors.extend(bucket)
+        return errors
+
+    def run_grouped(self, root: Node) -> List[List[RuleError]]:
+        """
+        Ошибки отдельными списками по правилам, в порядке списка rules.
+        Время каждого правила (begin и все его обработчики) и число его
+        ошибок записываются в метрики.
+        """
+        buckets: List[List[RuleError]] = [[] for _ in self.rules]
+        spent = [0.0] * len(self.rules)
+        handlers = self._handlers
+
+        for index, rule in enumerate(self.rules):
+            start = perf_counter()
+            rule.begin(root)
+            spent[index] += perf_counter() - start
+
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            for index, handler in handlers.get(node.node_type, ()):
+                start = perf_counter()
+                found = handler(node)
+                spent[index] += perf_counter() - start
+                if found:
+                    buckets[index].extend(found)
+            children = node.children
+            if children:
+                stack.extend(reversed(children))
+
+        for rule, seconds, found in zip(self.rules, spent, buckets):
+            name = type(rule).__name__
+            metrics.RULE_SECONDS.observe(seconds, rule=name)
+            if found:
+                metrics.RULE_ERRORS.inc(len(found), rule=name)
+
+        return buckets
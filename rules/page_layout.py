@@ -1,16 +1,28 @@
 import statistics
-from dom import Document, PageNumber, Paragraph, Line
+from dom import Node, Page, PageNumber, Paragraph, Line
+from rules.engine import Rule
 from errors import RuleError, ErrorType
+from columnar import ColumnStore, store_of, segment_reduce
 from typing import List
+import numpy as np
 
 CM_TO_PT = 28.35
 PT_TO_MM = 10 / CM_TO_PT
 
-class RulePageMargins:
+class RulePageMargins(Rule):
     """
     Проверка полей страницы по контенту (расстояние от текста/таблиц/картинок до краёв страницы)
     и наличие/позицию номера страницы
     """
+
+    name = "margins"
+    requires = frozenset({"spans", "links", "page_numbers", "images", "columns"})
+    # Допуски разброса строк абзаца при определении выравнивания, pt
+    ALIGN_TOL_LEFT = 4
+    ALIGN_TOL_RIGHT = 12
+    ALIGN_TOL_WIDTH = 10
+    ALIGN_TOL_CENTER = 6
+
     def __init__(self,
                  top_mm=20, bottom_mm=20, left_mm=30, right_mm=20,
                  tol_mm=1, right_toll_mm=2.5,
@@ -24,78 +36,88 @@ class RulePageMargins:
         self.tol = tol_mm
         self.page_number_bottom = page_number_bottom_mm
         self.page_number_margin = page_number_margin_mm
+        self._store = None
+
+    def begin(self, root: Node):
+        self._store = store_of(root)
+        if self._store is not None:
+            self._valid = self._store.paragraph_valid
+            self._alignments = self.check_store(self._store)
 
-    def check(self, document: Document) -> List[RuleError]:
+    def visit_page(self, page: Page) -> List[RuleError]:
         errors: List[RuleError] = []
 
-        for page in document.pages:
-            content_boxes = []
-            for node in page.children:
-                if isinstance(node, PageNumber):
-                    continue
-                if hasattr(node, "bbox") and node.bbox:
-                    content_boxes.append(node.bbox)
-
-            if content_boxes:
-                x0s, y0s, x1s, y1s = zip(*content_boxes)
-                content_x0 = min(x0s)
-                content_y0 = min(y0s)
-                content_x1 = max(x1s)
-                content_y1 = max(y1s)
-
-                top_margin = content_y0
-                bottom_margin = page.bbox[3] - content_y1
-                left_margin = content_x0
-                right_margin = page.bbox[2] - content_x1
-
-                top_mm = top_margin * PT_TO_MM
-                bottom_mm = bottom_margin * PT_TO_MM
-                left_mm = left_margin * PT_TO_MM
-                right_mm = right_margin * PT_TO_MM
-
-                if top_mm + self.tol < self.top:
-                    errors.append(RuleError(
-                        message=f"Верхнее поле меньше ГОСТ: {top_mm:.1f} мм < {self.top} мм",
-                        node=page,
-                        node_id=page.node_id,
-                        error_type=ErrorType.PAGE_MARGIN
-                    ))
-
-                if bottom_mm + self.tol < self.bottom:
-                    errors.append(RuleError(
-                        message=f"Нижнее поле меньше ГОСТ: {bottom_mm:.1f} мм < {self.bottom} мм",
-                        node=page,
-                        node_id=page.node_id,
-                        error_type=ErrorType.PAGE_MARGIN
-                    ))
-
-                if left_mm + self.tol < self.left:
-                    errors.append(RuleError(
-                        message=f"Левое поле меньше ГОСТ: {left_mm:.1f} мм < {self.left} мм",
-                        node=page,
-                        node_id=page.node_id,
-                        error_type=ErrorType.PAGE_MARGIN
-                    ))
-
-                if right_mm + self.right_toll < self.right:
-                    errors.append(RuleError(
-                        message=f"Правое поле меньше ГОСТ: {right_mm:.1f} мм < {self.right} мм",
-                        node=page,
-                        node_id=page.node_id,
-                        error_type=ErrorType.PAGE_MARGIN
-                    ))
-
-            for node in page.children:
-                if isinstance(node, PageNumber):
-                    errors.extend(self.check_page_number(page, node))
-                    continue
-
-                if isinstance(node, Paragraph):
-                    errors.extend(self.check_paragraph_alignment(node))
+        content_boxes = []
+        for node in page.children:
+            if isinstance(node, PageNumber):
+                continue
+            if hasattr(node, "bbox") and node.bbox:
+                content_boxes.append(node.bbox)
+
+        if content_boxes:
+            x0s, y0s, x1s, y1s = zip(*content_boxes)
+            content_x0 = min(x0s)
+            content_y0 = min(y0s)
+            content_x1 = max(x1s)
+            content_y1 = max(y1s)
+
+            top_margin = content_y0
+            bottom_margin = page.bbox[3] - content_y1
+            left_margin = content_x0
+            right_margin = page.bbox[2] - content_x1
+
+            top_mm = top_margin * PT_TO_MM
+            bottom_mm = bottom_margin * PT_TO_MM
+            left_mm = left_margin * PT_TO_MM
+            right_mm = right_margin * PT_TO_MM
+
+            if top_mm + self.tol < self.top:
+                errors.append(RuleError(
+                    message=f"Верхнее поле меньше ГОСТ: {top_mm:.1f} мм < {self.top} мм",
+                    node=page,
+                    node_id=page.node_id,
+                    error_type=ErrorType.PAGE_MARGIN
+                ))
+
+            if bottom_mm + self.tol < self.bottom:
+                errors.append(RuleError(
+                    message=f"Нижнее поле меньше ГОСТ: {bottom_mm:.1f} мм < {self.bottom} мм",
+                    node=page,
+                    node_id=page.node_id,
+                    error_type=ErrorType.PAGE_MARGIN
+                ))
+
+            if left_mm + self.tol < self.left:
+                errors.append(RuleError(
+                    message=f"Левое поле меньше ГОСТ: {left_mm:.1f} мм < {self.left} мм",
+                    node=page,
+                    node_id=page.node_id,
+                    error_type=ErrorType.PAGE_MARGIN
+                ))
 
+            if right_mm + self.right_toll < self.right:
+                errors.append(RuleError(
+                    message=f"Правое поле меньше ГОСТ: {right_mm:.1f} мм < {self.right} мм",
+                    node=page,
+                    node_id=page.node_id,
+                    error_type=ErrorType.PAGE_MARGIN
+                ))
 
         return errors
 
+    def visit_page_number(self, node: PageNumber) -> List[RuleError]:
+        return self.check_page_number(node.parent, node)
+
+    def visit_paragraph(self, node: Paragraph) -> List[RuleError]:
+        if self._store is not None:
+            idx = self._store.paragraph_index.get(node)
+            if idx is not None and self._valid[idx]:
+                alignment = self._alignments[idx]
+                if alignment is None or alignment == "justify":
+                    return []
+                return [self._alignment_error(node, alignment)]
+        return self.check_paragraph_alignment(node)
+
     def check_page_number(self, page, page_number_node: PageNumber = None):
         errors: List[RuleError] = []
 
@@ -186,10 +208,10 @@ class RulePageMargins:
         width_var = max(widths) - min(widths)
         center_var = max(centers) - min(centers)
 
-        tol_left   = 4
-        tol_right  = 12
-        tol_width  = 10
-        tol_center = 6
+        tol_left   = self.ALIGN_TOL_LEFT
+        tol_right  = self.ALIGN_TOL_RIGHT
+        tol_width  = self.ALIGN_TOL_WIDTH
+        tol_center = self.ALIGN_TOL_CENTER
 
         if (
             left_var <= tol_left
@@ -207,11 +229,62 @@ class RulePageMargins:
             alignment = "unknown"
 
         if alignment != "justify":
-            errors.append(RuleError(
-                message=f"Абзац не выровнен по ширине (обнаружено: {alignment})",
-                node=paragraph,
-                node_id=paragraph.node_id,
-                error_type=ErrorType.PARAGRAPH_JUSTIFIED
-            ))
+            errors.append(self._alignment_error(paragraph, alignment))
 
         return errors
+
+    def check_store(self, store: ColumnStore) -> List[str | None]:
+        """
+        Векторизованный check_paragraph_alignment: выравнивание каждого абзаца
+        хранилища по строкам без первой и последней (None — меньше 4 строк).
+        """
+        counts = store.line_count
+        offsets = store.paragraph_line_offsets
+        bbox = store.line_bbox
+        result: List[str | None] = [None] * len(counts)
+        if not len(bbox):
+            return result
+
+        line_par = store.line_paragraph
+        position = np.arange(len(bbox)) - offsets[:-1][line_par]
+        eligible = counts >= 4
+        core = eligible[line_par] & (position > 0) & (position < counts[line_par] - 1)
+
+        lefts = bbox[core, 0]
+        rights = bbox[core, 2]
+        widths = rights - lefts
+        centers = (lefts + rights) / 2
+
+        core_counts = np.where(eligible, counts - 2, 0)
+        core_offsets = np.concatenate(([0], np.cumsum(core_counts)))
+
+        def spread(values):
+            return segment_reduce(np.maximum, values, core_offsets) - segment_reduce(np.minimum, values, core_offsets)
+
+        left_var = spread(lefts)
+        right_var = spread(rights)
+        width_var = spread(widths)
+        center_var = spread(centers)
+
+        alignment = np.select(
+            [
+                (left_var <= self.ALIGN_TOL_LEFT) & (right_var <= self.ALIGN_TOL_RIGHT) & (width_var <= self.ALIGN_TOL_WIDTH),
+                center_var <= self.ALIGN_TOL_CENTER,
+                left_var <= self.ALIGN_TOL_LEFT,
+                right_var <= self.ALIGN_TOL_RIGHT,
+            ],
+            ["justify", "center", "left", "right"],
+            "unknown",
+        )
+
+        for idx in np.nonzero(eligible)[0]:
+            result[idx] = str(alignment[idx])
+        return result
+
+    def _alignment_error(self, paragraph: Paragraph, alignment: str) -> RuleError:
+        return RuleError(
+            message=f"Абзац не выровнен по ширине (обнаружено: {alignment})",
+            node=paragraph,
+            node_id=paragraph.node_id,
+            error_type=ErrorType.PARAGRAPH_JUSTIFIED
+        )
@@ -1,27 +1,40 @@
-from dom import Paragraph
+from dom import Node, Paragraph
+from rules.engine import Rule
 from errors import RuleError, ErrorType
+from columnar import ColumnStore, store_of
 from typing import List
+import numpy as np
 
 CM_TO_PT = 28.35
 
-class RuleParagraphIndent:
+class RuleParagraphIndent(Rule):
     """
     Проверка абзацного отступа первой строки (1.25 см по ГОСТ)
     """
 
+    name = "indent"
+    requires = frozenset({"spans", "links", "page_numbers", "columns"})
+
     def __init__(self, indent_cm=1.25, tol_pt=4):
         self.indent_pt = indent_cm * CM_TO_PT
         self.tol = tol_pt
+        self._store = None
 
-    def check(self, document) -> List[RuleError]:
-        errors = []
+    def begin(self, root: Node):
+        self._store = store_of(root)
+        if self._store is not None:
+            self._valid = self._store.paragraph_valid
+            self._indents = self.check_store(self._store)
 
-        for page in document.pages:
-            for node in page.children:
-                if isinstance(node, Paragraph):
-                    errors.extend(self.check_paragraph(node))
-
-        return errors
+    def visit_paragraph(self, node: Paragraph) -> List[RuleError]:
+        if self._store is not None:
+            idx = self._store.paragraph_index.get(node)
+            if idx is not None and self._valid[idx]:
+                indent = self._indents[idx]
+                if np.isnan(indent) or abs(indent - self.indent_pt) <= self.tol:
+                    return []
+                return [self._error(node, float(indent))]
+        return self.check_paragraph(node)
 
     def check_paragraph(self, paragraph: Paragraph) -> List[RuleError]:
         errors = []
@@ -39,16 +52,46 @@ class RuleParagraphIndent:
         indent = first_left - base_left
 
         if abs(indent - self.indent_pt) > self.tol:
-            errors.append(RuleError(
-                message=(
-                    f"Неверный абзацный отступ первой строки: "
-                    f"{indent / CM_TO_PT:.2f} см (норма {self.indent_pt / CM_TO_PT:.2f} см)"
-                ),
-                node=paragraph,
-                node_id=paragraph.node_id,
-                error_type=ErrorType.PARAGRAPH_INDENT,
-                expected=self.indent_pt / CM_TO_PT,
-                found=indent / CM_TO_PT
-            ))
+            errors.append(self._error(paragraph, indent))
 
         return errors
+
+    def check_store(self, store: ColumnStore) -> np.ndarray:
+        """
+        Векторизованный расчёт отступа первой строки для всех абзацев хранилища:
+        x0 первой строки минус медиана x0 остальных строк (NaN — меньше двух строк).
+        """
+        counts = store.line_count
+        offsets = store.paragraph_line_offsets
+        x0 = store.line_bbox[:, 0]
+        indents = np.full(len(counts), np.nan)
+        if not len(x0):
+            return indents
+
+        is_first = np.zeros(len(x0), dtype=bool)
+        is_first[offsets[:-1][counts > 0]] = True
+
+        other_par = store.line_paragraph[~is_first]
+        other_x0 = x0[~is_first]
+        sorted_x0 = other_x0[np.lexsort((other_x0, other_par))]
+
+        other_counts = np.maximum(counts - 1, 0)
+        other_offsets = np.concatenate(([0], np.cumsum(other_counts)))
+
+        eligible = counts >= 2
+        base_left = sorted_x0[other_offsets[:-1][eligible] + other_counts[eligible] // 2]
+        indents[eligible] = x0[offsets[:-1][eligible]] - base_left
+        return indents
+
+    def _error(self, paragraph: Paragraph, indent: float) -> RuleError:
+        return RuleError(
+            message=(
+                f"Неверный абзацный отступ первой строки: "
+                f"{indent / CM_TO_PT:.2f} см (норма {self.indent_pt / CM_TO_PT:.2f} см)"
+            ),
+            node=paragraph,
+            node_id=paragraph.node_id,
+            error_type=ErrorType.PARAGRAPH_INDENT,
+            expected=self.indent_pt / CM_TO_PT,
+            found=indent / CM_TO_PT
+        )
@@ -1,29 +1,40 @@
-from typing import List
-from dom import Document, Paragraph, Line
+from typing import Dict, List
+from dom import Node, Paragraph, Line
+from rules.engine import Rule
 from errors import RuleError, ErrorType
+from columnar import ColumnStore, store_of
+import numpy as np
 import statistics
 
 
-class RuleLineSpacing:
+class RuleLineSpacing(Rule):
     """
     Проверка межстрочного интервала.
     ГОСТ 7.32: основной текст — 1.5
     """
 
+    name = "line_spacing"
+    requires = frozenset({"spans", "links", "page_numbers", "columns"})
+
     def __init__(self, expected=1.5, tol=0.15):
         self.expected = expected
         self.min_ratio = expected - tol
         self.max_ratio = expected + tol
+        self._store = None
 
-    def check(self, document: Document) -> List[RuleError]:
-        errors: List[RuleError] = []
-
-        for page in document.pages:
-            for node in page.children:
-                if isinstance(node, Paragraph):
-                    errors.extend(self.check_paragraph(node))
+    def begin(self, root: Node):
+        self._store = store_of(root)
+        if self._store is not None:
+            self._valid = self._store.paragraph_valid
+            self._bad_ratios = self.check_store(self._store)
 
-        return errors
+    def visit_paragraph(self, node: Paragraph) -> List[RuleError]:
+        if self._store is not None:
+            idx = self._store.paragraph_index.get(node)
+            if idx is not None and self._valid[idx]:
+                bad_lines = self._bad_ratios.get(idx)
+                return [self._error(node, bad_lines)] if bad_lines else []
+        return self.check_paragraph(node)
 
     def check_paragraph(self, paragraph: Paragraph) -> List[RuleError]:
         errors: List[RuleError] = []
@@ -46,15 +57,50 @@ class RuleLineSpacing:
                 bad_lines.append(ratio)
 
         if bad_lines and len(bad_lines) / (len(lines) - 1) > 0.3:
-            errors.append(RuleError(
-                message=(
-                    f"Неверный межстрочный интервал: "
-                    f"ожидалось {self.expected}, найдено "
-                    f"{statistics.median(bad_lines):.2f}"
-                ),
-                node=paragraph,
-                node_id=paragraph.node_id,
-                error_type=ErrorType.SPACING
-            ))
+            errors.append(self._error(paragraph, bad_lines))
 
         return errors
+
+    def check_store(self, store: ColumnStore) -> Dict[int, List[float]]:
+        """
+        Векторизованный check_paragraph по всем абзацам хранилища.
+        Возвращает для нарушающих абзацев список «плохих» интервалов.
+        """
+        bbox = store.line_bbox
+        counts = store.line_count
+        if len(bbox) < 2:
+            return {}
+
+        line_par = store.line_paragraph
+        prev, cur = bbox[:-1], bbox[1:]
+        same_paragraph = line_par[:-1] == line_par[1:]
+
+        h = prev[:, 3] - prev[:, 1]
+        gap = cur[:, 1] - prev[:, 3]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = (h + gap) / h
+            in_range = (self.min_ratio <= ratio) & (ratio <= self.max_ratio)
+        bad = same_paragraph & (h > 0) & ~in_range
+
+        bad_count = np.bincount(line_par[:-1][bad], minlength=len(counts))
+        pairs = np.maximum(counts - 1, 1)
+        flagged = np.nonzero((counts >= 2) & (bad_count > 0) & (bad_count / pairs > 0.3))[0]
+
+        offsets = store.paragraph_line_offsets
+        result = {}
+        for idx in flagged:
+            start, stop = offsets[idx], offsets[idx + 1] - 1
+            result[int(idx)] = [float(r) for r in ratio[start:stop][bad[start:stop]]]
+        return result
+
+    def _error(self, paragraph: Paragraph, bad_lines: List[float]) -> RuleError:
+        return RuleError(
+            message=(
+                f"Неверный межстрочный интервал: "
+                f"ожидалось {self.expected}, найдено "
+                f"{statistics.median(bad_lines):.2f}"
+            ),
+            node=paragraph,
+            node_id=paragraph.node_id,
+            error_type=ErrorType.SPACING
+        )
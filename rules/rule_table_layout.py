@@ -1,12 +1,14 @@
 import re
 from typing import List, Optional
-from dom import Document, Table, Paragraph
+from dom import Table, Paragraph
+from rules.engine import Rule
+from spatial import index_of
 from errors import RuleError, ErrorType
 
 CM_TO_PT = 28.35
 
 
-class RuleTableLayout:
+class RuleTableLayout(Rule):
     """
     Проверки таблиц по ГОСТ 7.32:
     - центрирование
@@ -14,6 +16,9 @@ class RuleTableLayout:
     - положение названия
     """
 
+    name = "tables"
+    requires = frozenset({"spans", "links", "page_numbers", "spatial"})
+
     def __init__(
         self,
         left_mm=30,
@@ -24,18 +29,9 @@ class RuleTableLayout:
         self.right_mm = right_mm
         self.tol_pt = tol_pt
 
-    def check(self, document: Document) -> List[RuleError]:
-        errors: List[RuleError] = []
-
-        for page in document.pages:
-            for node in page.children:
-                if not isinstance(node, Table):
-                    continue
-
-                errors.extend(self._check_table_center(page, node))
-                errors.extend(self._check_table_caption(page, node))
-
-        return errors
+    def visit_table(self, node: Table) -> List[RuleError]:
+        page = node.parent
+        return self._check_table_center(page, node) + self._check_table_caption(page, node)
 
 
     def _check_table_center(self, page, table: Table) -> List[RuleError]:
@@ -67,23 +63,12 @@ class RuleTableLayout:
         table: Table
     ) -> Optional[Paragraph]:
 
-        table_top = table.bbox[1]
-
-        candidates = []
-        for node in page.children:
-            if not isinstance(node, Paragraph):
-                continue
-
-            if node.bbox[3] <= table_top:
-                distance = table_top - node.bbox[3]
-                if distance < 40:
-                    candidates.append((distance, node))
-
-        if not candidates:
+        caption = index_of(page).nearest_above(
+            table.bbox, 40, lambda node: isinstance(node, Paragraph)
+        )
+        if caption is None or table.bbox[1] - caption.bbox[3] >= 40:
             return None
-
-        candidates.sort(key=lambda x: x[0])
-        return candidates[0][1]
+        return caption
 
 
     def _check_table_caption(self, page, table: Table) -> List[RuleError]:
@@ -1,39 +1,69 @@
-from dom import Node, Document, Heading, Paragraph
+from dom import Heading, Paragraph, Page, Node
 from errors import RuleError, ErrorType
-from typing import List
+from rules.engine import Rule
+from typing import List, Optional
 
-class RuleHeadingFollowedByParagraph:
+class RuleHeadingFollowedByParagraph(Rule):
     """Проверяет структуру заголовков и абзацев"""
-    def check(self, document: Document) -> List[RuleError]:
-        errors: List[RuleError] = []
-
-        def check_children(children: List[Node]):
-            for i, node in enumerate(children):
-                if isinstance(node, Heading):
-                    next_node = node.next_sibling
-                    while next_node and not isinstance(next_node, (Paragraph, Heading)):
-                        next_node = next_node.next_sibling
-
-                    if not next_node:
-                        error = RuleError(
-                            message=f"После заголовка '{node.text.strip()}' нет абзаца/подзаголовка",
-                            node=node,
-                            node_id=node.node_id,
-                            error_type=ErrorType.HEADING_STRUCTURE
-                        )
-                        node.errors.append(error)
-                        errors.append(error)
-                    elif isinstance(next_node, Heading) and next_node.level > node.level + 1:
-                        error = RuleError(
-                            message=f"После заголовка '{node.text.strip()}' сразу заголовок слишком низкого уровня",
-                            node=node,
-                            node_id=node.node_id,
-                            error_type=ErrorType.HEADING_STRUCTURE
-                        )
-                        node.errors.append(error)
-                        errors.append(error)
-
-                check_children(getattr(node, "children", []))
-
-        check_children(document.children)
+
+    name = "structure"
+    requires = frozenset({"spans", "links", "page_numbers"})
+    scope = "document"
+
+    def visit_heading(self, node: Heading) -> List[RuleError]:
+        error = self._check(node, self._next_level(node))
+        if error is None:
+            return []
+
+        node.errors.append(error)
+        return [error]
+
+    def summarize(self, page: Page) -> List[dict]:
+        """Заголовки страницы и уровень следующего за каждым узла"""
+        return [
+            {"page": page.number, "level": node.level, "text": node.text, "bbox": list(node.bbox),
+             "node_id": node.node_id, "next_level": self._next_level(node)}
+            for node in page.children
+            if isinstance(node, Heading)
+        ]
+
+    def check_summaries(self, summaries: List[List[dict]]) -> List[RuleError]:
+        """
+        Заголовки восстанавливаются без поддеревьев и привязываются к пустой
+        странице с тем же номером — этого достаточно для отчёта.
+        """
+        errors = []
+        for page_summary in summaries:
+            for item in page_summary:
+                heading = Heading(parent=Page(number=item["page"]), level=item["level"], text=item["text"],
+                                  bbox=tuple(item["bbox"]), node_id=item["node_id"])
+                error = self._check(heading, item["next_level"])
+                if error is not None:
+                    errors.append(error)
         return errors
+
+    def _next_level(self, node: Node) -> Optional[int]:
+        """Уровень следующего заголовка, 0 — абзац, None — ни того, ни другого"""
+        for sibling in node.following_siblings():
+            if isinstance(sibling, Paragraph):
+                return 0
+            if isinstance(sibling, Heading):
+                return sibling.level
+        return None
+
+    def _check(self, node: Heading, next_level: Optional[int]) -> Optional[RuleError]:
+        if next_level is None:
+            return RuleError(
+                message=f"После заголовка '{node.text.strip()}' нет абзаца/подзаголовка",
+                node=node,
+                node_id=node.node_id,
+                error_type=ErrorType.HEADING_STRUCTURE
+            )
+        if next_level > node.level + 1:
+            return RuleError(
+                message=f"После заголовка '{node.text.strip()}' сразу заголовок слишком низкого уровня",
+                node=node,
+                node_id=node.node_id,
+                error_type=ErrorType.HEADING_STRUCTURE
+            )
+        return None
@@ -0,0 +1,106 @@
+import fitz
+import hashlib
+from time import perf_counter
+from typing import Iterator
+import metrics
+from dom import Document, Page
+from errors import RuleError
+from parser_dom import PDFDOMParser, open_pdf
+from renderer import render_errors
+
+
+class PDFSession:
+    """
+    Владеет одним открытым fitz.Document на весь конвейер
+    разбор → правила → отрисовка и закрывает его при выходе из with.
+    source — байты PDF или путь к файлу; файл не читается в память целиком.
+    """
+
+    def __init__(self, source, parser: PDFDOMParser = None):
+        self.source = source
+        self.parser = parser or PDFDOMParser()
+        with metrics.OPEN_SECONDS.time():
+            self.pdf: fitz.Document = open_pdf(source)
+        self.document: Document | None = None
+
+    def parse(self, debug_page: int = None, progress=None) -> Document:
+        if self.document is None:
+            with metrics.PARSE_SECONDS.time():
+                self.document = self.parser.parse_document(self.pdf, self.source,
+                                                           debug_page=debug_page, progress=progress)
+        return self.document
+
+    def iter_pages(self, keep_pages: bool = True) -> Iterator[Page]:
+        """
+        Постраничный разбор: каждая страница отдаётся сразу после разбора.
+        keep_pages=False — страница не остаётся в self.document и отвязывается
+        от fitz.Page, когда вызывающий переходит к следующей.
+        """
+        self.document = Document()
+        pages = self.parser.iter_pages(self.pdf, self.document, page_stores=True, keep_pages=keep_pages)
+        spent = 0.0
+        try:
+            while True:
+                # время разбора — без времени, проведённого у вызывающего
+                start = perf_counter()
+                page = next(pages, None)
+                spent += perf_counter() - start
+                if page is None:
+                    break
+                yield page
+                if not keep_pages:
+                    page.orig = None
+                    page.store = None
+                    page.index = None
+        finally:
+            metrics.PARSE_SECONDS.observe(spent)
+
+    def parse_page(self, page_index: int) -> Page:
+        """Разбор одной страницы вне дерева документа"""
+        with metrics.PARSE_SECONDS.time():
+            return self.parser.parse_page(self.pdf, page_index)
+
+    def page_fingerprints(self) -> list[str]:
+        return [fingerprint_page(page) for page in self.pdf]
+
+    def render(self, errors: list[RuleError], draw_lines=False, output_path: str = None):
+        """
+        Добавляет комментарии прямо в открытый документ и сериализует его:
+        в байты или, если задан output_path, в файл (тогда возвращается путь).
+        """
+        return render_errors(self.pdf, errors, draw_lines=draw_lines, output_path=output_path)
+
+    def close(self):
+        if self.document is not None:
+            for page in self.document.pages:
+                page.orig = None
+        if not self.pdf.is_closed:
+            self.pdf.close()
+
+    def __enter__(self) -> "PDFSession":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def fingerprint_page(page: fitz.Page) -> str:
+    """
+    Отпечаток содержимого страницы: размеры, поток содержимого, ресурсы
+    (шрифты — по именам, изображения и формы — по сырым потокам) и ссылки.
+    Номера объектов (xref) в отпечаток не входят: при пересохранении документа
+    они меняются, а разбор страницы от них не зависит.
+    """
+    pdf = page.parent
+    digest = hashlib.sha256()
+    digest.update(repr((tuple(page.rect), page.rotation)).encode())
+    digest.update(page.read_contents())
+    for _xref, _ext, _type, basefont, name, encoding, *_ in page.get_fonts(full=True):
+        digest.update(f"\0font\0{basefont}\0{name}\0{encoding}".encode())
+    for xref, *_ in page.get_images(full=True):
+        digest.update(b"\0image\0" + pdf.xref_stream_raw(xref))
+    for xref, name, *_ in page.get_xobjects():
+        digest.update(f"\0form\0{name}\0".encode() + pdf.xref_stream_raw(xref))
+    for link in page.get_links():
+        digest.update(f"\0link\0{tuple(link['from'])}\0{link.get('uri')}".encode())
+    return digest.hexdigest()
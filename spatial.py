@@ -0,0 +1,127 @@
+from math import floor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BBox = Tuple[float, float, float, float]
+
+# Область сетки по умолчанию: 14400 pt — наибольший размер страницы по спецификации PDF
+MAX_BOUNDS: BBox = (0.0, 0.0, 14400.0, 14400.0)
+
+
+def rects_intersect(a: BBox, b: BBox) -> bool:
+    """Пересечение с ненулевой площадью — как fitz.Rect.intersects, без создания Rect"""
+    return (
+        a[0] < a[2] and a[1] < a[3]
+        and b[0] < b[2] and b[1] < b[3]
+        and a[0] < b[2] and b[0] < a[2]
+        and a[1] < b[3] and b[1] < a[3]
+    )
+
+
+class GridIndex:
+    """
+    Равномерная сетка для поиска элементов страницы по геометрии.
+    Результаты всегда возвращаются в порядке вставки, поэтому при равенстве
+    расстояний выигрывает элемент, вставленный раньше (как при линейном проходе).
+
+    Сетка покрывает bounds (обычно — страницу): координаты за её пределами
+    прижимаются к краю и при вставке, и при поиске, поэтому огромный или
+    повреждённый bbox занимает не больше ячеек, чем вся страница.
+    """
+
+    def __init__(self, cell_size: float = 36.0, bounds: BBox = MAX_BOUNDS):
+        self.cell_size = cell_size
+        self.bounds = tuple(bounds)
+        self._items: List[Any] = []
+        self._bboxes: List[BBox] = []
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        self._rows: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _span(self, lo: float, hi: float, axis: int) -> range:
+        low, high = self.bounds[axis], self.bounds[axis + 2]
+        # сравнения записаны так, чтобы NaN тоже прижимался к краю
+        lo = min(lo, high) if lo >= low else low
+        hi = max(hi, low) if hi <= high else high
+        return range(floor(lo / self.cell_size), floor(hi / self.cell_size) + 1)
+
+    def _rows_of(self, y0: float, y1: float) -> range:
+        return self._span(y0, y1, 1)
+
+    def _cols_of(self, x0: float, x1: float) -> range:
+        return self._span(x0, x1, 0)
+
+    def insert(self, bbox: BBox, item: Any):
+        if not bbox:
+            return
+        idx = len(self._items)
+        self._items.append(item)
+        self._bboxes.append(tuple(bbox))
+        x0, y0, x1, y1 = bbox
+        for row in self._rows_of(y0, y1):
+            self._rows.setdefault(row, []).append(idx)
+            for col in self._cols_of(x0, x1):
+                self._cells.setdefault((col, row), []).append(idx)
+
+    def intersecting(self, bbox: BBox) -> List[Any]:
+        """Элементы, пересекающиеся с bbox"""
+        x0, y0, x1, y1 = bbox
+        candidates = set()
+        for row in self._rows_of(y0, y1):
+            for col in self._cols_of(x0, x1):
+                candidates.update(self._cells.get((col, row), ()))
+        return [self._items[i] for i in sorted(candidates) if rects_intersect(self._bboxes[i], bbox)]
+
+    def nearest_above(self, bbox: BBox, max_distance: float,
+                      predicate: Callable[[Any], bool] = None) -> Optional[Any]:
+        """Ближайший элемент целиком выше bbox, не дальше max_distance (по вертикали)"""
+        top = bbox[1]
+        return self._nearest(
+            self._rows_of(top - max_distance, top),
+            lambda b: top - b[3] if b[3] <= top else None,
+            max_distance, predicate,
+        )
+
+    def nearest_below(self, bbox: BBox, max_distance: float,
+                      predicate: Callable[[Any], bool] = None) -> Optional[Any]:
+        """Ближайший элемент целиком ниже bbox, не дальше max_distance (по вертикали)"""
+        bottom = bbox[3]
+        return self._nearest(
+            self._rows_of(bottom, bottom + max_distance),
+            lambda b: b[1] - bottom if b[1] >= bottom else None,
+            max_distance, predicate,
+        )
+
+    def _nearest(self, rows: range, distance_of, max_distance: float, predicate) -> Optional[Any]:
+        candidates = set()
+        for row in rows:
+            candidates.update(self._rows.get(row, ()))
+
+        best = None
+        best_distance = None
+        for i in sorted(candidates):
+            distance = distance_of(self._bboxes[i])
+            if distance is None or distance > max_distance:
+                continue
+            if predicate is not None and not predicate(self._items[i]):
+                continue
+            if best_distance is None or distance < best_distance:
+                best, best_distance = self._items[i], distance
+        return best
+
+
+def index_of(page) -> GridIndex:
+    """Индекс верхнеуровневых элементов страницы (строится парсером или при первом обращении)"""
+    if page.index is None:
+        page.index = build_page_index(page)
+    return page.index
+
+
+def build_page_index(page) -> GridIndex:
+    index = GridIndex(bounds=page.bbox)
+    for node in page.children:
+        bbox = getattr(node, "bbox", None)
+        if bbox:
+            index.insert(bbox, node)
+    return index
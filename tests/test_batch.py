@@ -0,0 +1,68 @@
+import asyncio
+import io
+import json
+import os
+import pathlib
+import zipfile
+import pytest
+import batch
+import config
+from batch import BatchItem, run_batch, _Budget, _expand_zip
+from executor import PDFExecutor
+from uploads import UploadTooLargeError, _spool
+
+PDF_DIR = pathlib.Path(__file__).parent / "examples"
+
+
+def make_zip(tmp_path, entries: dict) -> str:
+    path = tmp_path / "group.zip"
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+def spooled(name: str, data: bytes) -> BatchItem:
+    return BatchItem(name=name, upload=_spool(io.BytesIO(data), name, len(data)))
+
+
+def test_expand_zip_isolates_bad_entries(tmp_path):
+    pdf = (PDF_DIR / "font.pdf").read_bytes()
+    path = make_zip(tmp_path, {"a/font.pdf": pdf, "notes.txt": b"x", "b.pdf": b"broken"})
+    items = _expand_zip("group.zip", path, _Budget(10 ** 9))
+
+    assert [(i.name, i.error is None) for i in items] == [("font.pdf", True), ("notes.txt", False), ("b.pdf", False)]
+    batch.close_items(items)
+
+
+def test_expand_zip_limits_unpacked_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "MAX_UPLOAD_BYTES", 1024 * 1024)
+    path = make_zip(tmp_path, {"bomb.pdf": b"%PDF" + bytes(10 * 1024 * 1024), "small.pdf": b"%PDF-1.7"})
+
+    items = _expand_zip("group.zip", path, _Budget(10 ** 9))
+    assert [(i.name, i.upload is None) for i in items] == [("bomb.pdf", True), ("small.pdf", False)]
+    batch.close_items(items)
+
+    with pytest.raises(UploadTooLargeError):
+        _expand_zip("group.zip", path, _Budget(4))
+
+
+def test_run_batch_returns_processed_files_and_summary(monkeypatch):
+    monkeypatch.setattr(batch, "executor", PDFExecutor(mode="thread", workers=2))
+    items = [
+        spooled("font.pdf", (PDF_DIR / "font.pdf").read_bytes()),
+        spooled("crash.pdf", b"%PDF-1.7 garbage"),
+        spooled("fields.pdf", (PDF_DIR / "fields.pdf").read_bytes()),
+    ]
+
+    async def collect():
+        return b"".join([chunk async for chunk in run_batch(items)])
+
+    with zipfile.ZipFile(io.BytesIO(asyncio.run(collect()))) as archive:
+        names = set(archive.namelist())
+        summary = json.loads(archive.read("summary.json"))
+
+    assert names == {"processed/font.pdf", "processed/fields.pdf", "summary.json"}
+    assert [f["status"] for f in summary["files"]] == ["ok", "error", "ok"]
+    assert summary["ok"] == 2 and summary["failed"] == 1
+    assert not any(os.path.exists(item.upload.path) for item in items)
@@ -0,0 +1,53 @@
+from benchmarks.corpus import EXAMPLES_DIR, generate
+from benchmarks.load import percentile
+from benchmarks.stages import _clear_errors, compare, measure
+from parser_dom import PDFDOMParser
+from processor import make_rules
+from rules.engine import RuleEngine
+
+
+def result(seconds: float, peak_kb: float) -> dict:
+    return {"inputs": {"doc.pdf": {"stages": {"parse": {"seconds": seconds, "peak_kb": peak_kb}}}}}
+
+
+def test_compare_reports_slowdowns_over_threshold():
+    baseline = result(0.100, 1000)
+
+    assert compare(result(0.120, 1200), baseline, threshold=1.25, memory_threshold=1.5) == []
+    regressions = compare(result(0.200, 2000), baseline, threshold=1.25, memory_threshold=1.5)
+    assert len(regressions) == 2
+    # слишком короткие этапы по времени не сравниваются
+    assert compare(result(0.004, 1000), result(0.001, 1000), min_seconds=0.005) == []
+
+
+def test_generated_documents_are_reproducible():
+    assert generate("images", 2) == generate("images", 2)
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) is None
+
+
+def attached_errors(document) -> int:
+    count, stack = 0, [document]
+    while stack:
+        node = stack.pop()
+        count += len(node.errors)
+        stack.extend(node.children)
+    return count
+
+
+def test_rule_repeats_start_from_a_clean_tree():
+    data = (EXAMPLES_DIR / "font.pdf").read_bytes()
+    engine = RuleEngine(make_rules())
+
+    once = PDFDOMParser().parse_bytes(data)
+    engine.run(once)
+    repeated = PDFDOMParser().parse_bytes(data)
+    measure(engine.run, setup=lambda: _clear_errors(repeated), repeat=3)
+
+    assert attached_errors(repeated) == attached_errors(once) > 0
@@ -0,0 +1,55 @@
+import os
+import config
+from cache import ResultCache, MemoryTier, DiskTier, cache_key, render_key_parts
+
+
+def test_cache_key_depends_on_bytes_and_parts():
+    assert cache_key(b"%PDF-1", "render") == cache_key(b"%PDF-1", "render")
+    assert cache_key(b"%PDF-1", "render") != cache_key(b"%PDF-2", "render")
+    assert cache_key(b"%PDF-1", "render") != cache_key(b"%PDF-1", "json")
+
+
+def test_render_key_depends_on_render_mode(monkeypatch):
+    incremental = cache_key(b"%PDF-1", "render", *render_key_parts())
+    monkeypatch.setattr(config, "RENDER_MODE", "full")
+    assert cache_key(b"%PDF-1", "render", *render_key_parts()) != incremental
+
+
+def test_memory_tier_evicts_least_recently_used():
+    tier = MemoryTier(max_bytes=10)
+    tier.put("a", b"aaaa")
+    tier.put("b", b"bbbb")
+    assert tier.get("a") == b"aaaa"
+
+    tier.put("c", b"cccc")
+
+    assert tier.get("b") is None
+    assert tier.get("a") == b"aaaa"
+    assert tier.get("c") == b"cccc"
+    assert tier.size == 8
+
+
+def test_disk_tier_evicts_by_size(tmp_path):
+    tier = DiskTier(str(tmp_path), max_bytes=10)
+    tier.put("a", b"aaaa")
+    os.utime(tmp_path / "a", (1, 1))
+    tier.put("b", b"bbbb")
+    tier.put("c", b"cccc")
+
+    assert tier.get("a") is None
+    assert tier.get("b") == b"bbbb"
+    assert tier.get("c") == b"cccc"
+    assert tier.size == 8
+
+    tier.put("c", b"cc")
+    assert tier.size == 6
+    assert DiskTier(str(tmp_path), max_bytes=10).size == 6
+
+
+def test_result_cache_promotes_disk_hits_to_memory(tmp_path):
+    cache = ResultCache(memory_bytes=100, directory=str(tmp_path), disk_bytes=100)
+    cache.disk.put("key", b"value")
+
+    assert cache.get("key") == b"value"
+    assert cache.memory.get("key") == b"value"
+    assert cache.get("missing") is None
@@ -0,0 +1,67 @@
+import pathlib
+import random
+import pytest
+from columnar import ColumnStore
+from dom import Document, Page, Paragraph, Line, Span
+from parser_dom import PDFDOMParser
+from rules import RuleLineSpacing, RuleParagraphIndent, RulePageMargins
+
+PDF_DIR = pathlib.Path(__file__).parent / "examples"
+
+GEOMETRIC_RULES = [RuleLineSpacing, RuleParagraphIndent, RulePageMargins]
+
+
+def random_document(seed: int) -> Document:
+    rnd = random.Random(seed)
+    document = Document()
+    for number in range(5):
+        page = Page(number=number, bbox=(0, 0, 595, 842))
+        document.add_child(page)
+        document.pages.append(page)
+        y = 60.0
+        for _ in range(rnd.randint(0, 12)):
+            para = Paragraph()
+            left = 85 + rnd.choice([0, 0, 35.4, 10, rnd.uniform(-5, 60)])
+            for i in range(rnd.choice([1, 2, 3, 4, 5, 8, 15])):
+                height = rnd.choice([0, 12, 14, 14, 14])
+                x0 = left if i == 0 else 85 + rnd.choice([0, 0, 0, rnd.uniform(-3, 40)])
+                x1 = 538 - rnd.choice([0, 0, rnd.uniform(0, 120)])
+                bbox = (x0, y, x1, y + height)
+                line = Line(bbox=bbox)
+                span = Span(text="x", size=14, bbox=bbox)
+                line.spans.append(span)
+                line.add_child(span)
+                para.add_child(line)
+                y += height + rnd.choice([7, 7, 7, 2, 15])
+            para.bbox = para.children[0].bbox
+            page.add_child(para)
+    return document
+
+
+def messages(rule_class, document, columnar):
+    document.store = ColumnStore.from_pages(document.pages) if columnar else None
+    return [(e.message, e.node_id, e.expected, e.found) for e in rule_class().check(document)]
+
+
+@pytest.mark.parametrize("rule_class", GEOMETRIC_RULES)
+@pytest.mark.parametrize("seed", range(20))
+def test_columnar_rules_match_scalar_on_random_documents(rule_class, seed):
+    document = random_document(seed)
+    assert messages(rule_class, document, True) == messages(rule_class, document, False)
+
+
+@pytest.mark.parametrize("rule_class", GEOMETRIC_RULES)
+def test_columnar_rules_match_scalar_on_examples(rule_class):
+    for pdf_path in sorted(PDF_DIR.rglob("*.pdf")):
+        document = PDFDOMParser(columnar=False).parse_bytes(pdf_path.read_bytes())
+        assert messages(rule_class, document, True) == messages(rule_class, document, False)
+
+
+def test_store_offsets_follow_document_order():
+    document = random_document(3)
+    store = ColumnStore.from_pages(document.pages)
+
+    assert len(store.paragraph_line_offsets) == len(store.paragraphs) + 1
+    assert store.page_paragraph_offsets[-1] == len(store.paragraphs)
+    assert store.paragraph_line_offsets[-1] == len(store.line_bbox)
+    assert len(store.span_line) == len(store.span_size) == len(store.span_bbox)
@@ -0,0 +1,33 @@
+from dom import Page, Paragraph, Heading
+
+
+def make_page(count):
+    page = Page()
+    nodes = [Paragraph() for _ in range(count)]
+    for node in nodes:
+        page.add_child(node)
+    return page, nodes
+
+
+def test_siblings_follow_add_and_replace():
+    page, nodes = make_page(4)
+    heading = Heading(text="1 Введение")
+    assert page.replace_child(nodes[1], heading)
+
+    assert nodes[0].next_sibling is heading
+    assert heading.prev_sibling is nodes[0]
+    assert heading.next_sibling is nodes[2]
+    assert nodes[1].next_sibling is None
+    assert not page.replace_child(nodes[1], Paragraph())
+    assert list(heading.following_siblings()) == nodes[2:]
+    assert list(nodes[3].preceding_siblings()) == [nodes[2], heading, nodes[0]]
+
+
+def test_siblings_after_children_rewrite():
+    page, nodes = make_page(5)
+    page.children = [nodes[4], nodes[0], nodes[2]]
+
+    assert nodes[4].prev_sibling is None
+    assert nodes[0].next_sibling is nodes[2]
+    assert nodes[2].next_sibling is None
+    assert nodes[2].position == 2
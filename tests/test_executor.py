@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+import pytest
+
+from executor import PDFExecutor, QueueFullError
+
+
+def slow_items(produced, count=50):
+    for i in range(count):
+        produced.append(i)
+        time.sleep(0.01)
+        yield i
+
+
+def test_closed_stream_stops_worker_and_holds_slot_until_it_ends():
+    executor = PDFExecutor(mode="thread", workers=1, queue_size=0)
+    produced = []
+
+    async def scenario():
+        stream = executor.stream(slow_items, produced)
+        assert await anext(stream) == 0
+        with pytest.raises(QueueFullError):
+            await anext(executor.stream(slow_items, []))
+
+        await stream.aclose()
+        # место освобождается только после остановки обработчика
+        assert not executor.is_full()
+        stopped_at = len(produced)
+        await asyncio.sleep(0.1)
+        return stopped_at
+
+    stopped_at = asyncio.run(scenario())
+    assert stopped_at < 50
+    assert len(produced) == stopped_at
@@ -0,0 +1,92 @@
+import json
+import pathlib
+import threading
+import time
+import config
+from jobs import JobStore, run_job, DONE, FAILED, QUEUED
+
+PDF_DIR = pathlib.Path(__file__).parent / "examples"
+
+
+def test_job_lifecycle(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.submit("json", "page_numbers.pdf", (PDF_DIR / "page_numbers.pdf").read_bytes())
+
+    assert store.get(job_id)["status"] == QUEUED
+    assert store.claim("w1") == job_id
+    assert store.claim("w2") is None
+
+    run_job(store.path, job_id, "w1")
+
+    job = store.get(job_id)
+    assert job["status"] == DONE
+    assert job["progress"] == {"pages_done": 4, "pages_total": 4}
+    assert json.loads(store.result(job_id))["page_count"] == 4
+
+
+def test_broken_pdf_fails_and_crashed_job_is_retried(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    broken = store.submit("render", "broken.pdf", b"%PDF-1.7 garbage")
+    store.claim("w1")
+    run_job(store.path, broken, "w1")
+    assert store.get(broken)["status"] == FAILED
+    assert store.result(broken) is None
+
+    monkeypatch.setattr(config, "JOB_MAX_ATTEMPTS", 2)
+    crashed = store.submit("render", "font.pdf", b"%PDF")
+    store.claim("w1")
+    store.retry_or_fail(crashed, "w1", "crash")
+    assert store.get(crashed)["status"] == QUEUED
+    store.claim("w1")
+    store.retry_or_fail(crashed, "w1", "crash")
+    assert store.get(crashed)["status"] == FAILED
+
+
+def test_expired_jobs_are_removed(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(config, "JOB_RESULT_TTL", -1)
+    job_id = store.submit_done("json", "a.pdf", b"{}")
+
+    assert store.get(job_id) is None
+    store.maintain()
+    assert store.get(job_id) is None
+
+
+def test_long_running_job_is_not_requeued(tmp_path, monkeypatch):
+    import processor
+
+    def slow_report(data, progress=None):
+        time.sleep(1.5)
+        return b"{}"
+
+    monkeypatch.setattr(config, "JOB_STALE_SECONDS", 1)
+    monkeypatch.setattr(processor, "validate_pdf_json", slow_report)
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.submit("json", "a.pdf", b"%PDF")
+    store.claim("w1")
+
+    worker = threading.Thread(target=run_job, args=(store.path, job_id, "w1"))
+    worker.start()
+    time.sleep(1.2)
+    store.maintain()
+    assert store.get(job_id)["status"] == "running"
+    worker.join()
+    assert store.get(job_id)["status"] == DONE
+
+
+def test_late_finish_from_requeued_worker_is_ignored(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "JOB_STALE_SECONDS", -1)
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.submit("json", "a.pdf", b"%PDF")
+    store.claim("w1")
+    store.maintain()
+    assert store.get(job_id)["status"] == QUEUED
+    assert store.claim("w2") == job_id
+
+    assert not store.finish(job_id, "w1", b'{"stale": true}')
+    store.retry_or_fail(job_id, "w1", "crash")
+    assert store.get(job_id)["status"] == "running"
+
+    assert store.finish(job_id, "w2", b"{}")
+    assert store.get(job_id)["status"] == DONE
+    assert store.result(job_id) == b"{}"
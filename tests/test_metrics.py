@@ -0,0 +1,36 @@
+import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_seconds", "test", ("stage",), buckets=(0.1, 1))
+    try:
+        for value in (0.05, 0.5, 0.7, 3):
+            histogram.observe(value, stage="parse")
+
+        lines = histogram.render()
+        assert 'test_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{stage="parse",le="1"} 3' in lines
+        assert 'test_seconds_bucket{stage="parse",le="+Inf"} 4' in lines
+        assert 'test_seconds_count{stage="parse"} 4' in lines
+    finally:
+        metrics.REGISTRY.remove(histogram)
+
+
+def test_worker_metrics_merge_into_registry():
+    before = metrics.PAGES.value(), metrics.RULE_SECONDS.count(rule="RuleFontSize")
+    saved = metrics.export()
+
+    def work():
+        metrics.PAGES.inc(3)
+        metrics.RULE_SECONDS.observe(0.01, rule="RuleFontSize")
+        return "done"
+
+    # collecting() сбрасывает метрики процесса, как в обработчике пула
+    result, state = metrics.collecting(work)
+    metrics.reset()
+    metrics.merge(saved)
+    metrics.merge(state)
+
+    assert result == "done"
+    assert metrics.PAGES.value() == before[0] + 3
+    assert metrics.RULE_SECONDS.count(rule="RuleFontSize") == before[1] + 1
@@ -0,0 +1,51 @@
+import pathlib
+from dom import NODE_ID_SPACE
+from parser_dom import PDFDOMParser, open_pdf
+
+PDF_DIR = pathlib.Path(__file__).parent / "examples"
+
+
+def dump_tree(node):
+    return {
+        "type": node.node_type,
+        "bbox": getattr(node, "bbox", None),
+        "text": getattr(node, "text", None),
+        "children": [dump_tree(child) for child in node.children],
+    }
+
+
+def node_ids(node):
+    ids = [node.node_id]
+    for child in node.children:
+        ids.extend(node_ids(child))
+    return ids
+
+
+def test_parallel_parse_matches_serial():
+    data = (PDF_DIR / "page_numbers.pdf").read_bytes()
+
+    serial = PDFDOMParser(workers=1).parse_bytes(data)
+    parallel = PDFDOMParser(workers=3, parallel_min_pages=1).parse_bytes(data)
+
+    assert [p.number for p in parallel.pages] == [p.number for p in serial.pages]
+    assert dump_tree(parallel) == dump_tree(serial)
+    assert all(page.orig is not None for page in parallel.pages)
+
+
+def test_node_ids_are_deterministic():
+    data = (PDF_DIR / "page_numbers.pdf").read_bytes()
+
+    serial = PDFDOMParser(workers=1).parse_bytes(data)
+    first = PDFDOMParser(workers=2, parallel_min_pages=1).parse_bytes(data)
+    second = PDFDOMParser(workers=3, parallel_min_pages=1).parse_bytes(data)
+
+    ids = node_ids(serial)
+    assert node_ids(first) == ids
+    assert node_ids(second) == ids
+    assert len(set(ids)) == len(ids)
+
+    # страница, разобранная отдельно, получает те же идентификаторы
+    doc = open_pdf(data)
+    page = PDFDOMParser().parse_page(doc, 1)
+    assert node_ids(page) == node_ids(serial.pages[1])
+    assert page.node_id == 2 * NODE_ID_SPACE
@@ -0,0 +1,20 @@
+import pathlib
+
+from processor import validate_pdf_json
+from profiling import profiled, server_timing
+
+PDF_PATH = pathlib.Path(__file__).parent / "examples" / "page_numbers.pdf"
+
+
+def test_profiled_run_reports_stage_timings_and_stacks():
+    data = PDF_PATH.read_bytes()
+    result, profile = profiled(validate_pdf_json, data, interval_ms=1)
+
+    assert result == validate_pdf_json(data)
+    assert {"open", "parse", "rule.RuleFontSize"} <= set(profile.timings)
+    assert profile.samples > 0
+    assert all(stack.startswith("processor.py:validate_pdf_json") for stack in profile.stacks)
+
+    header = server_timing(profile, total_ms=12.5)
+    assert header.startswith("open;dur=")
+    assert header.endswith("total;dur=12.500")
@@ -0,0 +1,30 @@
+import pathlib
+
+import fitz
+import pytest
+
+from processor import validate_document
+from session import PDFSession
+from renderer import render_errors
+
+PDF_PATH = pathlib.Path(__file__).parent / "examples" / "page_numbers.pdf"
+
+
+def annotations(data: bytes):
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return [(page.number, annot.info["content"], tuple(annot.rect))
+                for page in doc for annot in page.annots()]
+
+
+@pytest.mark.parametrize("source", [PDF_PATH.read_bytes(), str(PDF_PATH)], ids=["bytes", "path"])
+def test_incremental_output_appends_to_input(source, tmp_path):
+    input_bytes = PDF_PATH.read_bytes()
+    with PDFSession(source) as session:
+        errors = validate_document(session.parse())
+        full = render_errors(input_bytes, errors, mode="full")
+        output_path = render_errors(session.pdf, errors, output_path=str(tmp_path / "out.pdf"),
+                                    mode="incremental")
+
+    incremental = pathlib.Path(output_path).read_bytes()
+    assert incremental.startswith(input_bytes)
+    assert annotations(incremental) == annotations(full) != []
@@ -0,0 +1,55 @@
+import pathlib
+import fitz
+import pytest
+from processor import validate_pdf_json, validate_pdf_incremental, page_fingerprints
+from revisions import compare_revisions
+
+PDF_DIR = pathlib.Path(__file__).parent / "examples"
+
+
+def edited(input_bytes: bytes, page_index: int) -> bytes:
+    with fitz.open(stream=input_bytes, filetype="pdf") as pdf:
+        pdf[page_index].insert_text((100, 400), "Новый абзац", fontname="helv", fontsize=14)
+        return pdf.tobytes(garbage=3)
+
+
+@pytest.mark.parametrize("pdf_path", sorted(PDF_DIR.rglob("*.pdf")), ids=lambda p: p.name)
+def test_incremental_matches_full_check(pdf_path):
+    input_bytes = pdf_path.read_bytes()
+    page_count = len(page_fingerprints(input_bytes))
+
+    report, fresh = validate_pdf_incremental(input_bytes, [None] * page_count)
+    assert report == validate_pdf_json(input_bytes)
+    assert sorted(fresh) == list(range(page_count))
+
+    cached = [fresh[i] for i in range(page_count)]
+    assert validate_pdf_incremental(input_bytes, cached) == (report, {})
+
+
+def test_only_edited_page_is_rechecked():
+    original = (PDF_DIR / "page_numbers.pdf").read_bytes()
+    revised = edited(original, 1)
+
+    old_fingerprints = page_fingerprints(original)
+    new_fingerprints = page_fingerprints(revised)
+    assert [i for i, (a, b) in enumerate(zip(old_fingerprints, new_fingerprints)) if a != b] == [1]
+
+    _, fresh = validate_pdf_incremental(original, [None] * len(old_fingerprints))
+    cached = [fresh[i] if a == b else None for i, (a, b) in enumerate(zip(old_fingerprints, new_fingerprints))]
+    report, recomputed = validate_pdf_incremental(revised, cached)
+
+    assert list(recomputed) == [1]
+    assert report == validate_pdf_json(revised)
+
+
+def test_compare_revisions():
+    error = {"page": 0, "bbox": [1, 2, 3, 4], "type": "font", "message": "m", "expected": None, "found": None}
+    fixed = dict(error, page=1)
+    new = dict(error, page=2)
+    previous = {"fingerprints": ["a", "b"], "errors": [error, fixed]}
+
+    result = compare_revisions("r1", previous, ["a", "c", "d"], [error, new])
+
+    assert result["changed_pages"] == [1, 2]
+    assert result["new"] == [new]
+    assert result["fixed"] == [fixed]
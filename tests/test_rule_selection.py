@@ -0,0 +1,26 @@
+import json
+import pathlib
+import pytest
+from processor import RULES, select_rules, validate_pdf_json
+
+PDF_DIR = pathlib.Path(__file__).parent / "examples"
+
+
+@pytest.mark.parametrize("pdf_path", sorted(PDF_DIR.rglob("*.pdf")), ids=lambda p: p.name)
+def test_selected_rules_match_full_run(pdf_path):
+    input_bytes = pdf_path.read_bytes()
+    full = json.loads(validate_pdf_json(input_bytes))["errors"]
+
+    # полная проверка — ошибки правил подряд, в порядке RULES
+    by_rule = [json.loads(validate_pdf_json(input_bytes, rule_names=(name,)))["errors"] for name in RULES]
+    assert [err for errors in by_rule for err in errors] == full
+
+
+def test_select_rules():
+    assert select_rules(None) is None
+    assert select_rules("margins, font,font") == ("font", "margins")
+    assert select_rules(",".join(reversed(RULES))) is None
+    with pytest.raises(ValueError):
+        select_rules("font,unknown")
+    with pytest.raises(ValueError):
+        select_rules(" , ")
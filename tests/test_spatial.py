@@ -0,0 +1,51 @@
+import random
+import fitz
+from spatial import GridIndex
+
+
+def random_rect(rnd):
+    x0, y0 = rnd.uniform(0, 595), rnd.uniform(0, 842)
+    return (x0, y0, x0 + rnd.choice([0, rnd.uniform(1, 200)]), y0 + rnd.choice([0, rnd.uniform(1, 60)]))
+
+
+def test_intersecting_matches_fitz():
+    rnd = random.Random(1)
+    rects = [random_rect(rnd) for _ in range(300)]
+    index = GridIndex()
+    for i, rect in enumerate(rects):
+        index.insert(rect, i)
+
+    for _ in range(200):
+        query = random_rect(rnd)
+        expected = [i for i, rect in enumerate(rects) if fitz.Rect(query).intersects(fitz.Rect(rect))]
+        assert index.intersecting(query) == expected
+
+
+def test_nearest_above_and_below():
+    index = GridIndex()
+    index.insert((0, 0, 100, 10), "far above")
+    index.insert((0, 20, 100, 30), "above")
+    index.insert((200, 20, 300, 30), "above, same distance")
+    index.insert((0, 90, 100, 100), "below")
+
+    target = (0, 50, 100, 60)
+    assert index.nearest_above(target, 40) == "above"
+    assert index.nearest_above(target, 10) is None
+    assert index.nearest_above(target, 40, lambda item: item != "above") == "above, same distance"
+    assert index.nearest_below(target, 30) == "below"
+    assert index.nearest_below(target, 29) is None
+
+
+def test_out_of_bounds_rects_are_clamped():
+    rnd = random.Random(2)
+    rects = [random_rect(rnd) for _ in range(100)]
+    rects += [(-1e9, -1e9, 1e9, 1e9), (-5e8, 100, -4e8, 200), (1e9, 1e9, 1e9 + 50, 1e9 + 50)]
+    index = GridIndex(bounds=(0, 0, 595, 842))
+    for i, rect in enumerate(rects):
+        index.insert(rect, i)
+    assert len(index._cells) <= 17 * 24
+
+    queries = [random_rect(rnd) for _ in range(100)] + [(-4.5e8, 150, 1e3, 160), (1e9 + 10, 1e9 + 10, 1e9 + 20, 1e9 + 20)]
+    for query in queries:
+        expected = [i for i, rect in enumerate(rects) if fitz.Rect(query).intersects(fitz.Rect(rect))]
+        assert index.intersecting(query) == expected
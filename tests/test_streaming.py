@@ -0,0 +1,39 @@
+import pathlib
+import pytest
+import config
+from dom import Page, Paragraph, Heading
+from processor import validate_pdf_json
+from rules import RuleHeadingFollowedByParagraph
+from rules.engine import Rule
+
+PDF_DIR = pathlib.Path(__file__).parent / "examples"
+
+
+@pytest.mark.parametrize("pdf_path", sorted(PDF_DIR.rglob("*.pdf")), ids=lambda p: p.name)
+def test_paged_validation_matches_full_tree(pdf_path, monkeypatch):
+    input_bytes = pdf_path.read_bytes()
+    monkeypatch.setattr(config, "STREAM_MIN_PAGES", 10 ** 9)
+    full = validate_pdf_json(input_bytes)
+    monkeypatch.setattr(config, "STREAM_MIN_PAGES", 0)
+    assert validate_pdf_json(input_bytes) == full
+
+
+def test_heading_rule_summaries_match_tree():
+    page = Page(number=3, bbox=(0, 0, 595, 842))
+    page.add_child(Heading(level=1, text="1 Введение", bbox=(85, 60, 300, 80)))
+    page.add_child(Heading(level=3, text="1.1.1 Цели", bbox=(85, 90, 300, 110)))
+    page.add_child(Paragraph(bbox=(85, 120, 538, 200)))
+    page.add_child(Heading(level=2, text="1.2 Итоги", bbox=(85, 210, 300, 230)))
+
+    rule = RuleHeadingFollowedByParagraph()
+    from_tree = [(e.message, e.to_dict()) for e in rule.check_page(page)]
+    from_summaries = [(e.message, e.to_dict()) for e in rule.check_summaries([rule.summarize(page)])]
+
+    assert len(from_tree) == 2
+    assert from_summaries == from_tree
+
+
+def test_document_rule_must_define_summaries():
+    with pytest.raises(TypeError):
+        class RuleWithoutSummaries(Rule):
+            scope = "document"
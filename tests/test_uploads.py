@@ -0,0 +1,31 @@
+import io
+import os
+
+import pytest
+
+import uploads
+from cache import cache_key
+from uploads import UploadTooLargeError, _spool
+
+
+def test_spool_writes_file_and_keeps_cache_key(monkeypatch, tmp_path):
+    monkeypatch.setattr(uploads.config, "SPOOL_DIR", str(tmp_path))
+    data = b"%PDF-1.4\n" + b"x" * (3 * uploads.CHUNK_SIZE)
+
+    upload = _spool(io.BytesIO(data), "doc.pdf", max_bytes=len(data))
+
+    assert upload.size == len(data)
+    assert upload.read_bytes() == data
+    assert upload.head.startswith(b"%PDF")
+    assert upload.key("render") == cache_key(data, "render")
+    upload.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_spool_stops_at_limit(monkeypatch, tmp_path):
+    monkeypatch.setattr(uploads.config, "SPOOL_DIR", str(tmp_path))
+    data = b"%PDF-1.4\n" + b"x" * (3 * uploads.CHUNK_SIZE)
+
+    with pytest.raises(UploadTooLargeError):
+        _spool(io.BytesIO(data), "doc.pdf", max_bytes=uploads.CHUNK_SIZE)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from fastapi import UploadFile
+
+import config
+from cache import digest_key
+
+CHUNK_SIZE = 1024 * 1024
+
+# Запас на заголовки multipart сверх размера самого файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Загрузка больше допустимого размера"""
+
+
+@dataclass
+class SpooledUpload:
+    """
+    Загруженный файл во временном файле на диске. sha256 считается при приёме,
+    поэтому ключ кэша не требует повторного чтения. Документ открывается
+    из path, а не из байтов в памяти.
+    """
+    path: str
+    filename: str
+    size: int
+    head: bytes
+    digest: "hashlib._Hash" = field(repr=False)
+
+    def key(self, *parts: str) -> str:
+        return digest_key(self.digest, *parts)
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def output_path(self, suffix: str = ".out.pdf") -> str:
+        """Путь для результата рядом с загрузкой; удаляется вместе с ней в close()"""
+        return self.path + suffix
+
+    def close(self):
+        for path in (self.path, self.output_path()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _spool(source, filename: str, max_bytes: int) -> SpooledUpload:
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=config.SPOOL_DIR or None)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := source.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"Файл больше {max_bytes // (1024 * 1024)} МБ")
+                if not head:
+                    head = chunk[:16]
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path=path, filename=filename, size=size, head=head, digest=digest)
+
+
+async def spool_upload(file: UploadFile, max_bytes: int = config.MAX_UPLOAD_BYTES) -> SpooledUpload:
+    """Переписывает загрузку во временный файл по кускам, не собирая её в памяти"""
+    return await asyncio.to_thread(_spool, file.file, file.filename, max_bytes)
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    """
+    Ограничивает размер тела запроса во время приёма: запрос с заведомо
+    большим Content-Length отклоняется сразу, а поток без него обрывается,
+    как только принято больше лимита. Ответ — 413.
+    """
+
+    def __init__(self, app, limits: Optional[Dict[str, int]] = None,
+                 default: int = config.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD):
+        self.app = app
+        self.limits = limits or {}
+        self.default = default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limits.get(scope["path"], self.default)
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            # ошибку разбора тела приложение может превратить в свой ответ — заменяем его на 413
+            if exceeded:
+                if message["type"] == "http.response.start":
+                    await self._reject(send, limit)
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _BodyTooLarge:
+            await self._reject(send, limit)
+
+    async def _reject(self, send, limit: int):
+        body = (
+            '{"detail":"Размер запроса больше допустимого (%d МБ)"}' % (limit // (1024 * 1024))
+        ).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})